@@ -3,15 +3,20 @@ import pandas as pd
 import plotly.express as px
 import os
 import io
+import re
+import json
 import time
 import traceback
 from datetime import datetime
-import tempfile
-import shutil
 from PIL import Image
 
 from src.utils.database import FurnitureDB
-from src.utils.model_utils import FurniturePredictor, FurnitureModelTrainer
+from src.utils.predictor import FurniturePredictor
+from src.utils.model_registry import get_model_registry
+from src.utils.prediction_cache import get_prediction_cache
+from src.utils.prediction_log import get_prediction_log_writer
+from src.utils.training_worker import ensure_worker_process
+from src.utils.metrics import STAGE_LATENCY, get_metrics_registry
 
 st.set_page_config(
     page_title="Furniture AI",
@@ -420,17 +425,37 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize predictor
+# Inference backend: 'keras' (default) or 'tflite' for the quantized export
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+# How the Keras backend calls the model: 'function' (default), 'predict' or 'serving_signature'
+INFERENCE_CALL_STRATEGY = os.environ.get('INFERENCE_CALL_STRATEGY', 'function')
+
+# Optional fast first-stage model; only low-confidence images reach the full model
+CASCADE_OPTIONS = {}
+if os.environ.get('CASCADE_MODEL_PATH'):
+    CASCADE_OPTIONS = {
+        'cascade_model_path': os.environ['CASCADE_MODEL_PATH'],
+        'cascade_threshold': float(os.environ.get('CASCADE_THRESHOLD', 0.9))
+    }
+
+# Initialize predictor from the process-wide registry so sessions share one loaded model
 print("🔄 Initializing predictor...")
 try:
     if 'predictor' not in st.session_state:
-        print("Creating new FurniturePredictor instance...")
-        st.session_state.predictor = FurniturePredictor()
-        print("Loading model...")
-        success = st.session_state.predictor.load_model()
-        if success:
+        print("Acquiring shared FurniturePredictor...")
+        handle = get_model_registry().acquire_handle(
+            use_batching=True,
+            backend=INFERENCE_BACKEND,
+            call_strategy=INFERENCE_CALL_STRATEGY,
+            cache=get_prediction_cache(),
+            **CASCADE_OPTIONS
+        )
+        if handle is not None:
+            st.session_state.predictor_handle = handle
+            st.session_state.predictor = handle.predictor
             print("✓ Predictor initialized and model loaded successfully")
         else:
+            st.session_state.predictor = FurniturePredictor(backend=INFERENCE_BACKEND, call_strategy=INFERENCE_CALL_STRATEGY)
             print("⚠️ Model loading failed, predictions may not work")
     else:
         print("✓ Using existing predictor instance")
@@ -438,18 +463,8 @@ except Exception as e:
     print(f"❌ Predictor initialization error: {e}")
     st.error(f"Predictor initialization failed: {e}")
 
-# Initialize trainer
-print("🔄 Initializing trainer...")
-try:
-    if 'trainer' not in st.session_state:
-        print("Creating new FurnitureModelTrainer instance...")
-        st.session_state.trainer = FurnitureModelTrainer()
-        print("✓ Trainer initialized successfully")
-    else:
-        print("✓ Using existing trainer instance")
-except Exception as e:
-    print(f"❌ Trainer initialization error: {e}")
-    st.error(f"Trainer initialization failed: {e}")
+# No trainer here: retraining runs in the training worker (src/utils/training_worker.py),
+# which imports src.utils.trainer and the Keras training stack only when a job starts
 
 # Initialize session state
 if 'current_page' not in st.session_state:
@@ -466,6 +481,19 @@ if 'last_training_page' not in st.session_state:
     st.session_state.last_training_page = None
 if 'training_session_id' not in st.session_state:
     st.session_state.training_session_id = None
+if 'training_job_id' not in st.session_state:
+    st.session_state.training_job_id = None
+    # Reattach to a job the worker is still running (e.g. after a page reload)
+    try:
+        if 'db' not in st.session_state:
+            st.session_state.db = FurnitureDB()
+        active_job = st.session_state.db.get_active_training_job()
+        if active_job is not None:
+            st.session_state.training_job_id = active_job['id']
+            st.session_state.training_in_progress = True
+            st.session_state.training_session_id = active_job['session_name']
+    except Exception:
+        pass
 
 # Check if running in deployment environment
 import os
@@ -523,37 +551,9 @@ def navigation():
     if 'db' not in st.session_state:
         st.session_state.db = FurnitureDB()
     
-    # Prevent navigation during training
+    # Training runs in the background worker, so navigation stays available
     if st.session_state.get('training_in_progress', False):
-        st.error("🚫 **TRAINING IN PROGRESS - NAVIGATION BLOCKED**")
-        st.warning("⏳ Training in progress... All navigation is disabled to prevent interruption.")
-        
-        # Show current training progress if available
-        if st.session_state.get('training_session_id'):
-            st.info(f"🔄 **Current Training Session:** {st.session_state.training_session_id}")
-        
-        # Show a prominent warning
-        st.markdown("""
-        <div style="background: linear-gradient(90deg, #ef4444 0%, #dc2626 100%); 
-                    padding: 1.5rem; border-radius: 10px; color: white; text-align: center; 
-                    margin: 1rem 0; box-shadow: 0 4px 16px rgba(239, 68, 68, 0.3);">
-            <h3 style="color: white !important; margin: 0;">
-                🚫 DO NOT CLOSE THIS PAGE OR NAVIGATE AWAY
-            </h3>
-            <p style="color: rgba(255, 255, 255, 0.9) !important; margin: 0.5rem 0 0 0;">
-                Training will be interrupted if you leave this page
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Only show cancel button
-        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
-        with col2:
-            if st.button("🛑 **Cancel Training**", type="secondary", use_container_width=True):
-                st.session_state.training_in_progress = False
-                st.session_state.training_completed = False
-                st.rerun()
-        return
+        st.info("🔄 **Training in progress in the background.** You can keep using the app; progress is shown on the Retrain page.")
     
     # Show training completed indicator in navigation
     training_indicator = ""
@@ -696,29 +696,21 @@ def show_predict():
         
         if uploaded_file is not None:
             try:
-                # Read the uploaded file content
-                image_bytes = uploaded_file.read()
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                # Verify it's a valid image
-                image.verify()
-                
-                # Reopen the image since verify() closes it
+                # Decode the upload once; load() forces a full decode so corrupt files fail here.
+                # Streamlit reruns this on every interaction, so the stage timings are only
+                # recorded below when this run actually classifies the image.
+                start = time.perf_counter()
                 image_bytes = uploaded_file.getvalue()
+                read_seconds = time.perf_counter() - start
                 image = Image.open(io.BytesIO(image_bytes))
+                start = time.perf_counter()
+                image.load()
+                decode_seconds = time.perf_counter() - start
             
                 display_image = image.copy()
                 display_image.thumbnail((250, 250), Image.Resampling.LANCZOS)
                 
                 st.image(display_image, caption="Uploaded Image", width=250)
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                    image.save(tmp_file.name, 'JPEG')
-                    temp_path = tmp_file.name
             
             except Exception as e:
                 st.error(f"Error loading image: {str(e)}")
@@ -728,10 +720,12 @@ def show_predict():
             if st.button("🔍 Classify Image", type="primary"):
                 with st.spinner("Analyzing image..."):
                     try:
-                        result = st.session_state.predictor.predict_image(temp_path)
+                        STAGE_LATENCY.labels(stage='upload_read').observe(read_seconds)
+                        STAGE_LATENCY.labels(stage='decode').observe(decode_seconds)
+                        result = st.session_state.predictor.predict_bytes(image_bytes, image=image)
                         
                         if result:
-                            st.session_state.db.log_prediction(
+                            get_prediction_log_writer(st.session_state.db).log(
                                 image_path=uploaded_file.name,
                                 predicted_class=result['predicted_class'],
                                 confidence=result['confidence']
@@ -776,11 +770,11 @@ def show_predict():
                                 st.write("- Model or label encoder loading issue")
                                 st.write("- Image preprocessing error") 
                                 st.write("- TensorFlow/prediction error")
-                                st.write("- File path or permissions issue")
                                 
                                 st.write("**Model status:**")
                                 if hasattr(st.session_state, 'predictor'):
-                                    st.write(f"- Model loaded: {st.session_state.predictor.model is not None}")
+                                    st.write(f"- Model loaded: {st.session_state.predictor.engine is not None}")
+                                    st.write(f"- Inference backend: {st.session_state.predictor.backend}")
                                     st.write(f"- Label encoder loaded: {st.session_state.predictor.label_encoder is not None}")
                                     if st.session_state.predictor.label_encoder:
                                         st.write(f"- Label encoder classes: {list(st.session_state.predictor.label_encoder.classes_)}")
@@ -801,13 +795,9 @@ def show_predict():
                                 st.write("- TensorFlow: Not available")
                             
                             st.write(f"- Python version: {os.sys.version}")
-                            st.write(f"- Image path exists: {os.path.exists(temp_path) if 'temp_path' in locals() else 'Unknown'}")
+                            st.write(f"- Image size: {image.size}, mode: {image.mode}")
                             
                         st.info("💡 **Tip**: Try uploading a different image or refresh the page to reload the model.")
-                    
-                    finally:
-                        if os.path.exists(temp_path):
-                            os.unlink(temp_path)
         
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -900,6 +890,8 @@ def show_analytics():
         else:
             st.info("📈 Make some predictions to see analytics here!")
         
+        show_inference_metrics()
+        
         # Model Training Overview Section
         st.markdown("---")
         st.markdown("### 🧠 Model Training Overview")
@@ -1093,41 +1085,57 @@ def show_analytics():
     except Exception as e:
         st.error(f"Error loading analytics: {str(e)}")
 
+def show_inference_metrics():
+    """Per-stage latency of this Streamlit process, read from the in-process metrics registry"""
+    st.markdown("---")
+    st.markdown("### ⏱️ Inference Latency by Stage")
+    
+    snapshot = get_metrics_registry().snapshot()
+    stages = pd.DataFrame([row for row in snapshot['furniture_stage_latency_seconds'] if row['count'] > 0])
+    if len(stages) == 0:
+        st.info("⏱️ Classify an image to see where prediction time is spent.")
+        return
+    
+    for column in ('mean', 'p50', 'p95', 'p99'):
+        stages[f'{column}_ms'] = stages[column] * 1000
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig = px.bar(
+            stages,
+            x='stage',
+            y=['p50_ms', 'p99_ms'],
+            barmode='group',
+            title="p50 / p99 Latency by Stage (ms)",
+            color_discrete_sequence=['#8B6EFF', '#7C3AED']
+        )
+        fig.update_layout(height=400, yaxis_title="Milliseconds", legend_title="")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        st.dataframe(
+            stages[['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']].round(2),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        gauges = {row.get('queue'): row['value'] for row in snapshot['furniture_queue_depth']}
+        batch_sizes = snapshot['furniture_inference_batch_size'][0]
+        cache_ratio = snapshot['furniture_prediction_cache_hit_ratio'][0]['value']
+        st.write(f"- Images through the model: {int(snapshot['furniture_predictions'][0]['value'])}")
+        if batch_sizes['count']:
+            st.write(f"- Mean batch size: {batch_sizes['mean']:.1f} over {batch_sizes['count']} forward passes")
+        st.write(f"- Prediction cache hit ratio: {cache_ratio:.1%}")
+        for queue_name, depth in gauges.items():
+            st.write(f"- {queue_name.replace('_', ' ').capitalize()} queue depth: {depth:.0f}")
+    
+    st.caption("Measured in this app process since it started; the API exposes the same metrics at /metrics.")
+
 def show_retrain():
-    # Check if training is in progress first - show this prominently
+    # Poll the background training job first
     if st.session_state.get('training_in_progress', False):
-        st.markdown("""
-        <div style="background: linear-gradient(90deg, #ef4444 0%, #dc2626 100%); 
-                    padding: 2rem; border-radius: 15px; color: white; text-align: center; 
-                    margin: 1rem 0; box-shadow: 0 6px 20px rgba(239, 68, 68, 0.4);">
-            <h1 style="color: white !important; margin: 0; font-size: 2.5rem;">
-                🚫 TRAINING IN PROGRESS
-            </h1>
-            <p style="color: rgba(255, 255, 255, 0.9) !important; margin: 0.5rem 0 0 0; font-size: 1.3rem;">
-                DO NOT NAVIGATE AWAY OR CLOSE THIS PAGE
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.error("⏳ **TRAINING IN PROGRESS - NAVIGATION DISABLED**")
-        st.info("Please wait while the model is being trained. Navigation is disabled to prevent interruption.")
-        
-        # Show current session info
-        if st.session_state.get('training_session_id'):
-            st.info(f"🔄 **Training Session:** {st.session_state.training_session_id}")
-        
-        # Show progress instructions
-        st.markdown("""
-        ### 📊 Training Progress
-        - The training progress will be shown below
-        - Each epoch will display loss and accuracy metrics
-        - Please be patient and do not refresh the page
-        """)
-        
-        if st.button("🛑 Cancel Training (Will lose progress)", type="secondary"):
-            st.session_state.training_in_progress = False
-            st.session_state.training_completed = False
-            st.rerun()
+        show_training_job_progress()
         return
     
     st.markdown("""
@@ -1256,7 +1264,6 @@ def show_retrain():
     if IS_DEPLOYED:
         st.warning("""
         **⚠️ Deployment Environment Detected**
-        - Training epochs will be limited to 5 to prevent timeout
         - Use fewer images (5-20) for optimal performance
         - Training may take 2-5 minutes depending on data size
         """)
@@ -1353,13 +1360,12 @@ def show_retrain():
             help="Name for this training session"
         )
         
-        max_epochs = 5 if IS_DEPLOYED else 20
         epochs = st.slider(
             "Training Epochs",
             min_value=1,
-            max_value=max_epochs,
-            value=min(10, max_epochs),
-            help=f"Number of training epochs (limited to {max_epochs} in deployment)"
+            max_value=20,
+            value=10,
+            help="Number of training epochs"
         )
         
         clear_user_data = st.checkbox(
@@ -1367,6 +1373,12 @@ def show_retrain():
             value=True,
             help="Remove previously uploaded user data"
         )
+        
+        fast_retrain = st.checkbox(
+            "Fast retrain (cached backbone features)",
+            value=True,
+            help="Train only the classifier head on cached backbone embeddings; only new images are run through the backbone"
+        )
     
     if st.session_state.selected_files:
         st.markdown("### 🏷️ Assign Labels")
@@ -1417,15 +1429,116 @@ def show_retrain():
             
             if st.form_submit_button(training_button_text, type="primary"):
                 if len(st.session_state.selected_files) >= 5:
-                    # Set training flag immediately to block navigation
-                    st.session_state.training_in_progress = True
-                    st.success("🚀 Training started! Navigation is now blocked.")
-                    time.sleep(1)  # Brief pause to show message
-                    start_retraining(st.session_state.selected_files, st.session_state.file_labels, session_name, epochs, clear_user_data)
+                    start_retraining(st.session_state.selected_files, st.session_state.file_labels, session_name, epochs, clear_user_data, fast_retrain)
                 else:
                     st.error("Please select at least 5 images for training.")
 
-def start_retraining(uploaded_files, labels, session_name, epochs, clear_user_data):
+def switch_to_retrained_model(model_save_path):
+    """Switch this session to a retrained model and drop models no session uses anymore"""
+    try:
+        registry = get_model_registry()
+        new_handle = registry.acquire_handle(
+            model_path=model_save_path,
+            label_encoder_path=model_save_path.replace('.h5', '_label_encoder.pkl'),
+            use_batching=True,
+            backend=INFERENCE_BACKEND,
+            call_strategy=INFERENCE_CALL_STRATEGY,
+            cache=get_prediction_cache(),
+            **CASCADE_OPTIONS
+        )
+        if new_handle is not None:
+            old_handle = st.session_state.get('predictor_handle')
+            st.session_state.predictor_handle = new_handle
+            st.session_state.predictor = new_handle.predictor
+            if old_handle is not None:
+                old_handle.release()
+            registry.evict_idle()
+            # Results from the previous model must not be served for the new one
+            get_prediction_cache().invalidate()
+        else:
+            st.warning("Warning: Could not load the retrained model, keeping the current one")
+    except Exception as pred_error:
+        st.warning(f"Warning: Could not update predictor: {pred_error}")
+
+def show_training_job_progress():
+    job_id = st.session_state.get('training_job_id')
+    job = st.session_state.db.get_training_job(job_id) if job_id is not None else None
+    if job is None:
+        st.session_state.training_in_progress = False
+        st.rerun()
+        return
+    
+    if job['status'] == 'completed':
+        switch_to_retrained_model(job['model_path'])
+        
+        training_session_id = f"{job['session_name']}_{int(time.time())}"
+        st.session_state.training_session_id = training_session_id
+        st.session_state.training_results = {
+            'final_accuracy': job['final_accuracy'],
+            'training_time': job['training_time_minutes'],
+            'total_data_count': job['total_data_count'],
+            'session_name': job['session_name'],
+            'session_id': training_session_id,
+            'completed_at': job['finished_at']
+        }
+        st.session_state.training_completed = True
+        st.session_state.training_in_progress = False
+        st.session_state.training_job_id = None
+        st.session_state.last_training_page = 'Retrain'
+        st.session_state.selected_files = []
+        st.session_state.file_labels = {}
+        st.rerun()
+        return
+    
+    if job['status'] in ('failed', 'cancelled'):
+        st.session_state.training_in_progress = False
+        st.session_state.training_completed = False
+        st.session_state.training_job_id = None
+        if job['status'] == 'failed':
+            st.error(f"❌ {job['message']}")
+        else:
+            st.warning("🛑 Training was cancelled. The current model is unchanged.")
+        if st.button("🔄 Back to Retraining"):
+            st.rerun()
+        return
+    
+    st.markdown("""
+    <div class="main-header">
+        <h1>🔄 Model Retraining</h1>
+        <p>Training runs in the background - you can keep using the app</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    st.info(f"🔄 **Training Session:** {job['session_name']}")
+    st.progress(min(float(job['progress'] or 0), 1.0))
+    
+    if job['status'] == 'queued':
+        st.text("⏳ Waiting for the training worker...")
+    else:
+        st.text(f"🧠 Epoch {job['current_epoch']}/{job['epochs']} - {job['message']}")
+    
+    if job['last_metrics']:
+        metrics = json.loads(job['last_metrics'])
+        columns = st.columns(len(metrics))
+        for column, (name, value) in zip(columns, metrics.items()):
+            column.metric(name, f"{value:.4f}")
+    
+    if job['cancel_requested']:
+        st.warning("🛑 Cancelling after the current epoch...")
+    elif st.button("🛑 Cancel Training", type="secondary"):
+        st.session_state.db.request_training_job_cancellation(job['id'])
+        st.rerun()
+        return
+    
+    # Poll the job row until it reaches a terminal status
+    time.sleep(2)
+    st.rerun()
+
+def _session_slug(session_name):
+    """File-name-safe form of the free-text session name"""
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', session_name).strip('_') or 'session'
+
+def start_retraining(uploaded_files, labels, session_name, epochs, clear_user_data, fast_retrain=False):
     if len(uploaded_files) < 5:
         st.error("⚠️ Minimum 5 images required for training. Please upload more images.")
         return
@@ -1444,75 +1557,23 @@ def start_retraining(uploaded_files, labels, session_name, epochs, clear_user_da
         if not st.checkbox("Continue training anyway (may have reduced accuracy)", key="force_train"):
             return
     
-    # Initialize training state
-    if 'training_in_progress' not in st.session_state:
-        st.session_state.training_in_progress = False
-    
-    if 'training_completed' not in st.session_state:
-        st.session_state.training_completed = False
-        
-    if 'training_results' not in st.session_state:
-        st.session_state.training_results = None
-    
     # Prevent multiple training sessions
-    if st.session_state.training_in_progress:
+    if st.session_state.get('training_in_progress', False) or st.session_state.db.get_active_training_job():
         st.warning("⏳ Training is already in progress. Please wait...")
         return
     
-    # Show results if training was completed
-    if st.session_state.training_completed and st.session_state.training_results:
-        st.success("🎉 Model Training Completed!")
-        
-        results = st.session_state.training_results
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Final Accuracy", f"{results['final_accuracy']:.1%}")
-        with col2:
-            st.metric("Training Time", f"{results['training_time']:.1f} min")
-        with col3:
-            st.metric("Total Data Used", results['total_data_count'])
-        
-        st.info("🔄 Model updated! New predictions will use the retrained model.")
-        
-        # Reset training state
-        if st.button("🔄 Start New Training Session"):
-            st.session_state.training_completed = False
-            st.session_state.training_results = None
-            st.rerun()
-        return
-    
-    # Start training - navigation is already blocked from the form submission
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    epoch_progress = st.empty()
-    
-    # Debug information
-    st.info(f"🔍 **Debug Info**: Starting training with {len(uploaded_files)} files, {epochs} epochs")
-    for file in uploaded_files:
-        st.write(f"• {file.name} -> {labels.get(file.name, 'Unknown')}")
-    
-    # Show training status
-    st.error("🚫 **TRAINING IN PROGRESS - DO NOT NAVIGATE AWAY**")
-    
     try:
-        # Reduce epochs for deployed environment to prevent timeout
-        adjusted_epochs = min(epochs, 5) if 'STREAMLIT_SHARING' in os.environ or 'RENDER' in os.environ else epochs
-        if adjusted_epochs < epochs:
-            st.warning(f"⚠️ Reducing epochs from {epochs} to {adjusted_epochs} for deployment environment")
-        
         if clear_user_data:
-            status_text.text("🧹 Clearing previous user data...")
             try:
                 st.session_state.db.clear_user_data()
-                st.success("✅ User data cleared successfully")
             except Exception as clear_error:
                 st.error(f"❌ Error clearing user data: {clear_error}")
                 return
-            progress_bar.progress(10)
-        
-        status_text.text("💾 Processing uploaded images...")
         
-        temp_dir = tempfile.mkdtemp()
+        # Uploads must outlive this request: the worker reads them while training.
+        # Session names are free text, so paths use a sanitized slug plus a unique suffix
+        run_name = f"{_session_slug(session_name)}_{int(time.time())}"
+        upload_dir = st.session_state.db.create_user_upload_dir(run_name)
         image_paths = []
         class_names_list = []
         class_ids = []
@@ -1521,173 +1582,55 @@ def start_retraining(uploaded_files, labels, session_name, epochs, clear_user_da
             'Almirah': 0, 'Chair': 1, 'Fridge': 2, 'Table': 3, 'TV': 4
         }
         
-        st.info(f"🔄 Processing {len(uploaded_files)} uploaded files...")
-        
-        for i, uploaded_file in enumerate(uploaded_files):
+        for uploaded_file in uploaded_files:
             try:
-                file_path = os.path.join(temp_dir, uploaded_file.name)
-                
-                # Reset file position and read content
+                file_path = os.path.join(upload_dir, os.path.basename(uploaded_file.name))
                 uploaded_file.seek(0)
-                file_content = uploaded_file.read()
-                
                 with open(file_path, 'wb') as f:
-                    f.write(file_content)
-                
-                # Reset file position again for potential future use
+                    f.write(uploaded_file.read())
                 uploaded_file.seek(0)
                 
                 image_paths.append(file_path)
                 class_name = labels[uploaded_file.name]
                 class_names_list.append(class_name)
                 class_ids.append(class_name_to_id[class_name])
-                
-                st.write(f"✅ Processed {uploaded_file.name} -> {class_name}")
-                
             except Exception as file_error:
                 st.error(f"❌ Error processing {uploaded_file.name}: {file_error}")
                 return
         
-        st.info(f"🔄 Adding {len(image_paths)} images to database...")
         try:
             st.session_state.db.add_user_data(image_paths, class_names_list, class_ids)
-            st.success("✅ Images added to database successfully")
         except Exception as db_error:
             st.error(f"❌ Error adding data to database: {db_error}")
             return
-            
-        progress_bar.progress(30)
-        
-        status_text.text("🔄 Preparing training data...")
-        try:
-            combined_data = st.session_state.db.get_combined_training_data()
-            st.info(f"🔄 Combined training data: {len(combined_data)} total samples")
-        except Exception as data_error:
-            st.error(f"❌ Error getting combined training data: {data_error}")
-            return
         
-        try:
-            requirements_met, message = st.session_state.db.check_training_data_requirements()
-            if not requirements_met:
-                st.error(f"❌ Training failed: {message}")
-                progress_bar.progress(0)
-                status_text.text("❌ Training requirements not met!")
-                st.session_state.training_in_progress = False
-                return
-            else:
-                st.success(f"✅ Training requirements met: {message}")
-        except Exception as req_error:
-            st.error(f"❌ Error checking training requirements: {req_error}")
+        requirements_met, message = st.session_state.db.check_training_data_requirements()
+        if not requirements_met:
+            st.error(f"❌ Training failed: {message}")
             return
         
-        progress_bar.progress(40)
-        
-        status_text.text(f"🧠 Training model ({adjusted_epochs} epochs)...")
-        
-        model_save_path = f"models/{session_name}.h5"
         os.makedirs("models", exist_ok=True)
-        
-        # Add timeout protection for training
-        start_time = time.time()
-        
-        # Create epoch progress display
-        epoch_tracker = st.empty()
-        epoch_tracker.info("📊 **Training Started:** Initializing model training...")
-        
-        training_results = st.session_state.trainer.train_model(
-            combined_data, 
-            epochs=adjusted_epochs, 
-            model_save_path=model_save_path
-        )
-        
-        elapsed_time = time.time() - start_time
-        
-        progress_bar.progress(80)
-        
-        status_text.text("💾 Saving results...")
-        
-        session_id = st.session_state.db.log_retraining_session(
+        job_id = st.session_state.db.submit_training_job(
             session_name=session_name,
-            original_count=training_results['original_count'],
-            user_count=training_results['user_count'],
-            total_count=len(combined_data),
-            final_accuracy=training_results['final_accuracy'],
-            training_time=training_results['training_time'],
-            model_path=model_save_path
+            epochs=epochs,
+            model_path=os.path.join("models", f"{run_name}.h5"),
+            use_embedding_cache=fast_retrain
         )
+        ensure_worker_process(st.session_state.db.db_path)
         
-        metrics = {
-            'final_accuracy': training_results['final_accuracy'],
-            'training_time_minutes': training_results['training_time']
-        }
-        st.session_state.db.log_metrics(session_id, metrics)
-        
-        # Create new predictor instance for retrained model
-        try:
-            st.session_state.predictor = FurniturePredictor(
-                model_path=model_save_path,
-                label_encoder_path=model_save_path.replace('.h5', '_label_encoder.pkl')
-            )
-        except Exception as pred_error:
-            st.warning(f"Warning: Could not update predictor: {pred_error}")
-        
-        # Store results in session state with unique identifier
-        training_session_id = f"{session_name}_{int(time.time())}"
-        st.session_state.training_session_id = training_session_id
-        st.session_state.training_results = {
-            'final_accuracy': training_results['final_accuracy'],
-            'training_time': training_results['training_time'],
-            'total_data_count': len(combined_data),
-            'session_name': session_name,
-            'session_id': training_session_id,
-            'completed_at': datetime.now().isoformat()
-        }
-        
-        progress_bar.progress(100)
-        status_text.text("✅ Training completed successfully!")
-        
-        # Mark training as completed and ensure we stay on retrain page
-        st.session_state.training_completed = True
-        st.session_state.training_in_progress = False
+        st.session_state.training_job_id = job_id
+        st.session_state.training_in_progress = True
+        st.session_state.training_completed = False
+        st.session_state.training_results = None
+        st.session_state.training_session_id = session_name
         st.session_state.last_training_page = 'Retrain'
-        st.session_state.current_page = 'Retrain'  # Force stay on retrain page
-        
-        # Clear the uploaded files after successful training
-        st.session_state.selected_files = []
-        st.session_state.file_labels = {}
-        
-        # Add a delay to ensure session state is properly saved
-        time.sleep(2)
-        
-        # Success message before rerun
-        st.success("🎉 Training completed! Results will be displayed...")
-        
-        # Force rerun to show results
         st.rerun()
         
     except Exception as e:
-        st.error(f"❌ Training failed: {str(e)}")
-        
-        # Show more specific error information
-        if "timeout" in str(e).lower():
-            st.error("🕐 Training timed out. Try reducing the number of epochs or images.")
-        elif "memory" in str(e).lower():
-            st.error("� Out of memory. Try reducing the number of images or using smaller images.")
-        else:
-            st.error("💥 Unexpected error occurred during training.")
-        
+        st.error(f"❌ Could not start training: {str(e)}")
         with st.expander("🔍 Error Details"):
-            import traceback
             st.code(traceback.format_exc())
-        
-        progress_bar.progress(0)
-        status_text.text("❌ Training failed!")
         st.session_state.training_in_progress = False
-        st.session_state.training_completed = False
-    
-    finally:
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
 
 def main():
     navigation()
@@ -18,13 +18,13 @@ def populate_database():
         return
     
     try:
-        # Load saved data
-        paths_train = np.load(os.path.join(processed_dir, 'paths_train.npy'))
-        paths_val = np.load(os.path.join(processed_dir, 'paths_val.npy'))
-        paths_test = np.load(os.path.join(processed_dir, 'paths_test.npy'))
-        y_train = np.load(os.path.join(processed_dir, 'y_train.npy'))
-        y_val = np.load(os.path.join(processed_dir, 'y_val.npy'))
-        y_test = np.load(os.path.join(processed_dir, 'y_test.npy'))
+        # Memory-map the saved arrays; populate_original_data reads them chunk by chunk
+        paths_train = np.load(os.path.join(processed_dir, 'paths_train.npy'), mmap_mode='r')
+        paths_val = np.load(os.path.join(processed_dir, 'paths_val.npy'), mmap_mode='r')
+        paths_test = np.load(os.path.join(processed_dir, 'paths_test.npy'), mmap_mode='r')
+        y_train = np.load(os.path.join(processed_dir, 'y_train.npy'), mmap_mode='r')
+        y_val = np.load(os.path.join(processed_dir, 'y_val.npy'), mmap_mode='r')
+        y_test = np.load(os.path.join(processed_dir, 'y_test.npy'), mmap_mode='r')
 
         # Load configuration
         with open(os.path.join(processed_dir, 'config.pkl'), 'rb') as f:
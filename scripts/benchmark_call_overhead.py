@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the per-call cost of each Keras call strategy
+
+Loads the model once per strategy ('predict', 'function', 'serving_signature';
+see FurniturePredictor.CALL_STRATEGIES), warms it up, then times the engine's
+forward pass alone on the same preprocessed batches. At batch size 1 the
+difference between strategies is almost entirely per-call overhead (data
+adapter and callback setup in Keras predict()); the table also checks that
+every strategy returns the same probabilities as predict().
+
+Usage:
+    python scripts/benchmark_call_overhead.py
+    python scripts/benchmark_call_overhead.py --batch-sizes 1 4 16 --iterations 200 --output calls.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.predictor import FurniturePredictor
+
+
+def time_calls(engine, batch, iterations):
+    """Per-call latencies in seconds"""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        engine.predict(batch)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-call overhead of the Keras call strategies")
+    parser.add_argument('--strategies', nargs='+', default=['predict', 'function', 'serving_signature'],
+                        choices=FurniturePredictor.CALL_STRATEGIES, help="The first one is the baseline")
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--label-encoder-path', default=None)
+    parser.add_argument('--output', default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    batches = {size: rng.random((size, 224, 224, 3), dtype=np.float32) for size in args.batch_sizes}
+
+    results = []
+    reference = {}
+    for strategy in args.strategies:
+        predictor = FurniturePredictor(args.model_path, args.label_encoder_path, call_strategy=strategy,
+                                       warmup_batch_sizes=args.batch_sizes)
+        if not predictor.load_model():
+            print(f"Error: Failed to load model for strategy {strategy}")
+            return False
+        engine = predictor.engine
+        actual = engine.describe().get('call_strategy')
+        if actual != strategy:
+            print(f"Warning: {strategy} fell back to {actual}")
+
+        for size, batch in batches.items():
+            outputs = np.asarray(engine.predict(batch))
+            reference.setdefault(size, outputs)
+            latencies = time_calls(engine, batch, args.iterations)
+            results.append({
+                'strategy': strategy,
+                'effective_strategy': actual,
+                'batch_size': size,
+                'median_ms': float(np.median(latencies) * 1000),
+                'p99_ms': float(np.percentile(latencies, 99) * 1000),
+                'per_image_ms': float(np.median(latencies) * 1000 / size),
+                'max_abs_diff': float(np.abs(outputs - reference[size]).max()),
+            })
+        predictor.close()
+
+    baseline = {row['batch_size']: row['median_ms'] for row in results if row['strategy'] == args.strategies[0]}
+    print(f"\n{args.iterations} calls per cell, forward pass only (speedup relative to '{args.strategies[0]}'):")
+    print(f"{'strategy':<19}{'batch':>6}{'median ms':>11}{'p99 ms':>9}{'ms/image':>10}{'speedup':>9}{'max diff':>10}")
+    for row in results:
+        speedup = baseline[row['batch_size']] / row['median_ms'] if row['median_ms'] else float('nan')
+        row['speedup'] = speedup
+        print(f"{row['strategy']:<19}{row['batch_size']:>6}{row['median_ms']:>11.2f}{row['p99_ms']:>9.2f}"
+              f"{row['per_image_ms']:>10.2f}{speedup:>8.1f}x{row['max_abs_diff']:>10.1e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'iterations': args.iterations, 'results': results}, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
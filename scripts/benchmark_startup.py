@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start time of the predictor: imports, model load and first prediction
+
+Every run happens in a fresh Python process, so nothing is already imported
+or loaded. Each process reports how long the imports took, how long
+load_model() took, and how long the first and second predictions took (the
+gap between them is the one-time graph tracing cost). The "training"
+scenario also imports src.utils.trainer, which is what every Streamlit
+session paid before the trainer was split out of model_utils.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --backend tflite --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+SCENARIOS = {
+    'serving': ['src.utils.predictor'],
+    'training': ['src.utils.predictor', 'src.utils.trainer'],
+}
+
+PHASES = ['import', 'model_load', 'first_prediction', 'second_prediction', 'process_total']
+
+
+def measure(args):
+    """Child process body: time each phase and print one JSON line"""
+    import importlib
+    timings = {}
+
+    start = time.perf_counter()
+    for module_name in SCENARIOS[args.scenario]:
+        importlib.import_module(module_name)
+    timings['import'] = time.perf_counter() - start
+
+    import numpy as np
+    from src.utils.predictor import FurniturePredictor
+
+    predictor = FurniturePredictor(args.model_path, args.label_encoder_path, backend=args.backend)
+    start = time.perf_counter()
+    if not predictor.load_model():
+        raise SystemExit("Error: Failed to load model")
+    timings['model_load'] = time.perf_counter() - start
+
+    image = np.random.default_rng(0).integers(0, 256, (predictor.img_size, predictor.img_size, 3), dtype=np.uint8)
+    for phase in ('first_prediction', 'second_prediction'):
+        start = time.perf_counter()
+        if predictor.predict_array(image) is None:
+            raise SystemExit("Error: Prediction failed")
+        timings[phase] = time.perf_counter() - start
+    predictor.close()
+
+    print('BENCHMARK ' + json.dumps(timings))
+
+
+def run_once(args, scenario):
+    """Start a fresh interpreter for one measurement; returns the timings dict"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--scenario', scenario,
+               '--backend', args.backend]
+    if args.model_path:
+        command += ['--model-path', args.model_path]
+    if args.label_encoder_path:
+        command += ['--label-encoder-path', args.label_encoder_path]
+
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    lines = [line for line in result.stdout.splitlines() if line.startswith('BENCHMARK ')]
+    if result.returncode != 0 or not lines:
+        print(result.stdout[-2000:])
+        print(result.stderr[-2000:])
+        return None
+    timings = json.loads(lines[-1][len('BENCHMARK '):])
+    timings['process_total'] = elapsed
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark predictor cold start in fresh processes")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes per scenario (median is reported)")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', default=None,
+                        help="Scenario(s) to run (default: all)")
+    parser.add_argument('--backend', default=os.environ.get('INFERENCE_BACKEND', 'keras'), choices=['keras', 'tflite'])
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--label-encoder-path', default=None)
+    parser.add_argument('--output', default=None, help="Also write the results to this JSON file")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.scenario = args.scenario[0]
+        measure(args)
+        return True
+
+    results = {}
+    for scenario in args.scenario or sorted(SCENARIOS):
+        runs = []
+        for run in range(args.runs):
+            timings = run_once(args, scenario)
+            if timings is None:
+                print(f"Error: {scenario} run {run + 1} failed")
+                return False
+            runs.append(timings)
+        results[scenario] = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+
+    print(f"\nCold start, median of {args.runs} fresh processes ({args.backend} backend), seconds:")
+    print(f"{'scenario':<10}" + ''.join(f"{phase:>19}" for phase in PHASES))
+    for scenario, timings in results.items():
+        print(f"{scenario:<10}" + ''.join(f"{timings[phase]:>19.3f}" for phase in PHASES))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'backend': args.backend, 'runs': args.runs, 'results': results}, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Measure how much memory each API worker adds, per inference backend
+
+Starts N processes that each load the model the way a scripts/serve_api.py
+worker does (FurniturePredictor with the backend, warmed up at the API batch
+sizes), waits until all of them are ready, then reads /proc/<pid>/smaps_rollup
+of every worker. PSS (proportional set size) splits shared pages between the
+processes mapping them, so the sum of PSS is what N workers really cost, and
+the growth from 1 to N workers divided by N-1 is the cost of one more worker.
+Private memory is what no other worker can share (heap, dequantized or
+repacked weights); Linux only.
+
+remote:<backend> measures the scripts/serve_api.py layout instead: one
+src/utils/inference_server.py process owns the model (its memory is counted
+once in the PSS total) and the workers only hold a RemoteEngine connected to it.
+
+Usage:
+    python scripts/benchmark_worker_memory.py --workers 4
+    python scripts/benchmark_worker_memory.py --workers 1 4 --backends keras tflite:float16 tflite:int8
+    python scripts/benchmark_worker_memory.py --workers 1 4 --backends keras remote:keras remote:tflite:int8
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps_rollup(pid):
+    """Memory totals of a process in MiB"""
+    totals = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(':') in FIELDS:
+                totals[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    totals['Private'] = totals.get('Private_Clean', 0) + totals.get('Private_Dirty', 0)
+    return totals
+
+
+def child(args):
+    """Worker body: load and warm up like a serve_api worker, then wait to be measured"""
+    from src.utils.predictor import FurniturePredictor
+
+    backend, _, quantization = args.backend.partition(':')
+    predictor = FurniturePredictor(
+        args.model_path, args.label_encoder_path, backend=backend,
+        quantization=quantization or 'float16', num_threads=1,
+        warmup_batch_sizes=(1, 16),
+        server_address=os.environ.get('INFERENCE_SERVER_ADDRESS'),
+        server_authkey=bytes.fromhex(os.environ.get('INFERENCE_SERVER_AUTHKEY', ''))
+    )
+    if not predictor.load_model():
+        raise SystemExit("Error: Failed to load model")
+    print('READY', flush=True)
+    sys.stdin.readline()
+
+
+def model_args(args):
+    paths = []
+    if args.model_path:
+        paths += ['--model-path', args.model_path]
+    if args.label_encoder_path:
+        paths += ['--label-encoder-path', args.label_encoder_path]
+    return paths
+
+
+def start_inference_server(args, backend, env):
+    """For remote:<backend>, start the model-owning server the workers connect to"""
+    served_backend, _, quantization = backend.partition(':')
+    socket_dir = tempfile.mkdtemp(prefix='benchmark-inference-')
+    env.update(
+        INFERENCE_SERVER_ADDRESS=os.path.join(socket_dir, 'inference.sock'),
+        INFERENCE_SERVER_AUTHKEY=os.urandom(32).hex()
+    )
+    server_env = dict(env, INFERENCE_BACKEND=served_backend, TFLITE_QUANTIZATION=quantization or 'float16',
+                      API_MICRO_BATCH_SIZE='16', API_BATCH_CHUNK_SIZE='16')
+    command = [sys.executable, '-m', 'src.utils.inference_server', '--address', env['INFERENCE_SERVER_ADDRESS']]
+    return subprocess.Popen(command + model_args(args), cwd=ROOT_DIR, env=server_env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL), socket_dir
+
+
+def measure(args, backend, num_workers):
+    """Start num_workers workers, measure them once all are loaded; returns the per-worker
+    totals and, for remote backends, the inference server's"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--backend', backend] + model_args(args)
+    env = dict(os.environ, TF_NUM_INTRAOP_THREADS='1', TF_NUM_INTEROP_THREADS='1', OMP_NUM_THREADS='1')
+    server = socket_dir = None
+    if backend.startswith('remote:'):
+        server, socket_dir = start_inference_server(args, backend.partition(':')[2], env)
+
+    workers = [subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+               for _ in range(num_workers)]
+    try:
+        for worker in workers:
+            output = []
+            for line in worker.stdout:
+                if line.startswith('READY'):
+                    break
+                output = (output + [line])[-20:]
+            else:
+                raise RuntimeError(f"{backend} worker exited before loading the model:\n{''.join(output)}")
+        return ([read_smaps_rollup(worker.pid) for worker in workers],
+                read_smaps_rollup(server.pid) if server else None)
+    finally:
+        for worker in workers:
+            try:
+                worker.stdin.write('\n')
+                worker.stdin.close()
+            except OSError:
+                pass
+            worker.wait()
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker memory (RSS/PSS) of each inference backend")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4],
+                        help="Worker counts to compare; the growth between the first and last is reported")
+    parser.add_argument('--backends', nargs='+', default=['keras', 'tflite:float16', 'tflite:int8'],
+                        help="keras, tflite:<quantization> or remote:<either of those>")
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--label-encoder-path', default=None)
+    parser.add_argument('--output', default=None, help="Also write the results to this JSON file")
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return True
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("Error: /proc/<pid>/smaps_rollup is not available (Linux 4.14+ only)")
+        return False
+
+    results = []
+    for backend in args.backends:
+        for num_workers in args.workers:
+            try:
+                totals, server_totals = measure(args, backend, num_workers)
+            except RuntimeError as e:
+                print(f"Error: {str(e)}")
+                return False
+            results.append({
+                'backend': backend,
+                'workers': num_workers,
+                'rss_mib_per_worker': sum(t['Rss'] for t in totals) / num_workers,
+                'private_mib_per_worker': sum(t['Private'] for t in totals) / num_workers,
+                'pss_mib_total': sum(t['Pss'] for t in totals) + (server_totals['Pss'] if server_totals else 0),
+                'server_pss_mib': server_totals['Pss'] if server_totals else None,
+            })
+
+    print(f"\nMemory once every worker is loaded and warmed up (MiB):")
+    print(f"{'backend':<22}{'workers':>8}{'RSS/worker':>12}{'private/worker':>16}{'PSS total':>11}")
+    for row in results:
+        print(f"{row['backend']:<22}{row['workers']:>8}{row['rss_mib_per_worker']:>12.1f}"
+              f"{row['private_mib_per_worker']:>16.1f}{row['pss_mib_total']:>11.1f}")
+
+    first, last = min(args.workers), max(args.workers)
+    if last > first:
+        print(f"\nPSS added per worker beyond {first}:")
+        for backend in args.backends:
+            pss = {row['workers']: row['pss_mib_total'] for row in results if row['backend'] == backend}
+            print(f"{backend:<22}{(pss[last] - pss[first]) / (last - first):>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Classify a large image collection in a streaming, resumable pipeline
+
+Inputs can be directories (walked recursively), glob patterns, single images
+and .zip/.tar(.gz) archives. Images flow through a bounded pipeline: a
+thread pool decodes a fixed window of images ahead of the model, each full
+batch gets one forward pass, and results are appended to a CSV or JSONL file
+(and optionally the predictions table) before the next batch starts, so
+memory stays constant however many images there are.
+
+After every batch a checkpoint records how many inputs were processed and
+the output file size. Re-running the same command resumes after the last
+completed batch; pass --restart to start over.
+
+Usage:
+    python scripts/bulk_classify.py catalog/ --output results.csv
+    python scripts/bulk_classify.py "photos/**/*.jpg" images.zip --output results.jsonl --log-to-db
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.predictor import FurniturePredictor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _is_archive(path):
+    return os.path.isfile(path) and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+
+def iter_archive(path):
+    """Yield (source_id, None, read_fn) for each image inside a zip or tar archive"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image(info.filename):
+                    yield f"{path}!{info.filename}", None, (lambda name=info.filename: archive.read(name))
+    else:
+        with tarfile.open(path, 'r:*') as archive:
+            for member in archive:
+                if member.isfile() and _is_image(member.name):
+                    yield f"{path}!{member.name}", None, (lambda m=member: archive.extractfile(m).read())
+
+
+def iter_inputs(inputs):
+    """Yield (source_id, file_path, read_fn) for every image, in a deterministic order
+
+    Files are decoded straight from disk by the worker pool (file_path); archive
+    members are read in order through read_fn, since archive handles are not thread-safe.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if _is_image(name):
+                        yield path, path, None
+        elif _is_archive(item):
+            yield from iter_archive(item)
+        elif os.path.isfile(item):
+            if _is_image(item):
+                yield item, item, None
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches:
+                print(f"Warning: No files match {item}")
+            for path in matches:
+                if _is_archive(path):
+                    yield from iter_archive(path)
+                elif os.path.isfile(path) and _is_image(path):
+                    yield path, path, None
+
+
+def stream_predictions(predictor, items, batch_size=64, num_workers=None, prefetch_batches=2):
+    """Yield one list of result rows per batch, in input order
+
+    At most ``prefetch_batches`` batches of decoded images are held in memory.
+    """
+    num_workers = num_workers or min(8, os.cpu_count() or 1)
+    max_in_flight = batch_size * prefetch_batches
+    buffer = np.empty((batch_size, predictor.img_size, predictor.img_size, 3), dtype=np.float32)
+
+    def decode(file_path, data):
+        return predictor.preprocess_image(file_path if data is None else io.BytesIO(data))
+
+    def finish(batch, packed):
+        results = iter(predictor.predict_preprocessed_batch(buffer[:packed], batch_size))
+        rows = []
+        for source_id, error in batch:
+            if error is None:
+                result = next(results)
+                rows.append({
+                    'source': source_id,
+                    'predicted_class': result['predicted_class'],
+                    'confidence': result['confidence'],
+                    'probabilities': dict(zip(result['class_names'], result['all_predictions'])),
+                    'error': None
+                })
+            else:
+                rows.append({'source': source_id, 'predicted_class': None, 'confidence': None,
+                             'probabilities': None, 'error': error})
+        return rows
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = deque()
+        batch = []
+        packed = 0
+        items = iter(items)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                try:
+                    source_id, file_path, read_fn = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                try:
+                    data = read_fn() if read_fn is not None else None
+                    in_flight.append((source_id, executor.submit(decode, file_path, data)))
+                except Exception as e:
+                    in_flight.append((source_id, e))
+            if not in_flight:
+                break
+
+            source_id, pending = in_flight.popleft()
+            try:
+                if isinstance(pending, Exception):
+                    raise pending
+                # Decoded images are packed at the front of the buffer in arrival order
+                buffer[packed] = pending.result()
+                packed += 1
+                batch.append((source_id, None))
+            except Exception as e:
+                batch.append((source_id, f"{type(e).__name__}: {e}"))
+
+            if len(batch) == batch_size:
+                yield finish(batch, packed)
+                batch, packed = [], 0
+        if batch:
+            yield finish(batch, packed)
+
+
+class ResultWriter:
+    """Appends result rows to a CSV or JSONL file"""
+
+    CSV_FIELDS = ['source', 'predicted_class', 'confidence', 'error']
+
+    def __init__(self, path, output_format, class_names, resume_offset=None):
+        self.path = path
+        self.format = output_format
+        self.class_names = list(class_names)
+        if resume_offset is not None and os.path.exists(path):
+            # Drop anything written after the last checkpoint
+            with open(path, 'r+b') as f:
+                f.truncate(resume_offset)
+            self.file = open(path, 'a', newline='', encoding='utf-8')
+        else:
+            self.file = open(path, 'w', newline='', encoding='utf-8')
+
+        if self.format == 'csv':
+            self.csv = csv.writer(self.file)
+            if self.file.tell() == 0:
+                self.csv.writerow(self.CSV_FIELDS + [f"prob_{name}" for name in self.class_names])
+
+    def write(self, rows):
+        for row in rows:
+            if self.format == 'csv':
+                probabilities = row['probabilities'] or {}
+                self.csv.writerow(
+                    [row['source'], row['predicted_class'] or '',
+                     '' if row['confidence'] is None else f"{row['confidence']:.6f}", row['error'] or '']
+                    + ['' if name not in probabilities else f"{probabilities[name]:.6f}" for name in self.class_names]
+                )
+            else:
+                self.file.write(json.dumps(row) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _skip_processed(items, checkpoint):
+    """Skip the inputs a previous run already completed, checking the order has not changed"""
+    processed = checkpoint['processed']
+    last_source = None
+    for _ in range(processed):
+        try:
+            last_source = next(items)[0]
+        except StopIteration:
+            break
+    if processed and last_source != checkpoint['last_source']:
+        raise SystemExit(
+            f"Inputs changed since the checkpoint was written (expected {checkpoint['last_source']!r} "
+            f"at position {processed}, found {last_source!r}); re-run with --restart"
+        )
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a directory, glob or archive of images through the classifier")
+    parser.add_argument('inputs', nargs='+', help="Directories, glob patterns, image files or .zip/.tar archives")
+    parser.add_argument('--output', required=True, help="Results file (.csv or .jsonl)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                        help="Output format (default: from the --output extension)")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint file (default: <output>.checkpoint.json)")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None, help="Decode threads (default: min(8, CPUs))")
+    parser.add_argument('--log-to-db', action='store_true', help="Also write results to the predictions table")
+    parser.add_argument('--db-path', default='database/furniture_classification.db')
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--label-encoder-path', default=None)
+    parser.add_argument('--backend', default=os.environ.get('INFERENCE_BACKEND', 'keras'),
+                        choices=sorted(FurniturePredictor.BACKENDS))
+    parser.add_argument('--call-strategy', default=os.environ.get('INFERENCE_CALL_STRATEGY', 'function'),
+                        choices=FurniturePredictor.CALL_STRATEGIES)
+    args = parser.parse_args()
+
+    output_format = args.format or ('jsonl' if args.output.endswith(('.jsonl', '.ndjson')) else 'csv')
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.json"
+
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint.get('inputs') != args.inputs:
+        print("Error: Checkpoint was written for different inputs; use --restart or another --checkpoint")
+        return False
+
+    predictor = FurniturePredictor(args.model_path, args.label_encoder_path, backend=args.backend,
+                                   call_strategy=args.call_strategy, warmup_batch_sizes=(args.batch_size,))
+    if not predictor.load_model():
+        print("Error: Failed to load model")
+        return False
+
+    db = None
+    if args.log_to_db:
+        from src.utils.database import FurnitureDB
+        db = FurnitureDB(args.db_path)
+
+    items = iter_inputs(args.inputs)
+    processed, offset = 0, None
+    if checkpoint is not None:
+        items = _skip_processed(items, checkpoint)
+        processed, offset = checkpoint['processed'], checkpoint['output_offset']
+        print(f"Resuming after {processed} already processed images")
+
+    writer = ResultWriter(args.output, output_format, predictor.class_names, resume_offset=offset)
+    start_time = time.time()
+    classified = failed = 0
+    try:
+        for rows in stream_predictions(predictor, items, args.batch_size, args.workers):
+            offset = writer.write(rows)
+            if db is not None:
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+                db.log_predictions([
+                    (row['source'], None, row['predicted_class'], row['confidence'], predictor.model_version, timestamp)
+                    for row in rows if row['error'] is None
+                ])
+            processed += len(rows)
+            failed += sum(1 for row in rows if row['error'] is not None)
+            classified += sum(1 for row in rows if row['error'] is None)
+            save_checkpoint(checkpoint_path, {
+                'inputs': args.inputs,
+                'processed': processed,
+                'last_source': rows[-1]['source'],
+                'output_offset': offset,
+            })
+            elapsed = time.time() - start_time
+            print(f"Processed {processed} images ({classified / max(elapsed, 1e-9):.1f} img/s this run, {failed} unreadable)")
+    finally:
+        writer.close()
+        predictor.close()
+
+    print(f"✅ Done: {classified} classified, {failed} unreadable in {time.time() - start_time:.1f}s -> {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
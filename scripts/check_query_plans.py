@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check that FurnitureDB's hot queries are served by the schema's indexes
+
+Runs EXPLAIN QUERY PLAN for each query and fails if the expected index is
+not used, or if SQLite falls back to a full table scan or a temporary sort.
+By default a fresh throwaway database is created, so the result only depends
+on the schema and migrations in src/utils/database.py.
+
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --db-path database/furniture_classification.db
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.database import FurnitureDB
+
+# (description, query, params, index that must appear in the plan)
+QUERY_PLAN_CHECKS = [
+    (
+        "Original training split for retraining",
+        "SELECT image_path, class_name, class_id FROM training_data WHERE dataset_type = 'train'",
+        (),
+        'idx_training_data_type_class',
+    ),
+    (
+        "Original data class distribution",
+        """SELECT class_name, COUNT(*) as count FROM training_data
+           WHERE dataset_type IN ('train', 'val', 'test') GROUP BY class_name""",
+        (),
+        'idx_training_data_type_class',
+    ),
+    (
+        "User data class distribution",
+        "SELECT class_name, COUNT(*) as count FROM user_data GROUP BY class_name",
+        (),
+        'idx_user_data_class',
+    ),
+    (
+        "Predictions per class with average confidence (rollup backfill)",
+        """SELECT predicted_class, COUNT(*), SUM(confidence) FROM predictions
+           GROUP BY predicted_class""",
+        (),
+        'idx_predictions_class_confidence',
+    ),
+    (
+        "Predictions per day (rollup backfill)",
+        """SELECT DATE(prediction_time), COUNT(*) FROM predictions
+           GROUP BY DATE(prediction_time)""",
+        (),
+        'idx_predictions_date',
+    ),
+    (
+        "Predictions on one day",
+        "SELECT COUNT(*) FROM predictions WHERE DATE(prediction_time) = ?",
+        ('2024-01-01',),
+        'idx_predictions_date',
+    ),
+    (
+        "Recent retraining sessions (startup recovery in app.py)",
+        """SELECT id, session_name, original_data_count, user_data_count, total_data_count,
+                  final_accuracy, training_time_minutes, model_path, created_at
+           FROM retraining_sessions ORDER BY created_at DESC""",
+        (),
+        'idx_retraining_sessions_created_at',
+    ),
+    (
+        "Metrics of one session",
+        "SELECT metric_name, metric_value, class_name FROM model_metrics WHERE session_id = ?",
+        (1,),
+        'idx_model_metrics_session',
+    ),
+    (
+        "Next queued training job",
+        "SELECT * FROM training_jobs WHERE status = 'queued' ORDER BY created_at, id LIMIT 1",
+        (),
+        'idx_training_jobs_status',
+    ),
+]
+
+FORBIDDEN = ('USE TEMP B-TREE FOR ORDER BY',)
+
+
+def check_plans(db):
+    """Return a list of failure messages (empty when every plan is as expected)"""
+    failures = []
+    for description, sql, params, index_name in QUERY_PLAN_CHECKS:
+        plan = db.explain_query_plan(sql, params)
+        problems = []
+        if not any(index_name in line for line in plan):
+            problems.append(f"does not use {index_name}")
+        problems.extend(f"has '{line}'" for line in plan if any(bad in line for bad in FORBIDDEN))
+        # A SCAN without an index means reading every row of the table
+        problems.extend(f"has '{line}'" for line in plan
+                        if line.startswith('SCAN') and 'INDEX' not in line)
+
+        status = "OK  " if not problems else "FAIL"
+        print(f"{status} {description}")
+        for line in plan:
+            print(f"       {line}")
+        if problems:
+            failures.append(f"{description}: {'; '.join(problems)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check EXPLAIN QUERY PLAN output for FurnitureDB queries")
+    parser.add_argument('--db-path', default=None,
+                        help="Database to check (migrations are applied to it); defaults to a temporary database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = FurnitureDB(args.db_path or os.path.join(temp_dir, 'query_plans.db'))
+        failures = check_plans(db)
+        db.pool.close_all()
+
+    if failures:
+        print(f"\n{len(failures)} query plan check(s) failed:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return False
+    print(f"\nAll {len(QUERY_PLAN_CHECKS)} query plans use their indexes")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
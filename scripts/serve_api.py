@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Multi-worker launcher for the FastAPI service (scripts/simple_api.py)
+
+The model is loaded once, by a single inference server process
+(src/utils/inference_server.py). The parent binds the listening socket, makes
+sure the model artifacts are ready, then forks that server and N uvicorn
+workers that all accept on the shared socket. Workers decode and preprocess
+uploads on their own slice of the CPUs and send the batches to the server
+over a private Unix socket (INFERENCE_BACKEND=remote), so they never import
+TensorFlow; the server runs its forward passes with every CPU and micro-batches
+single images across all workers. Crashed processes are restarted;
+SIGTERM/SIGINT stop them all.
+
+TensorFlow is not fork-safe: once its runtime has started (its thread pools
+exist), a forked child can deadlock. The parent never imports TensorFlow, so
+the model cannot be loaded before the fork and shared copy-on-write; one
+process owning it is what keeps memory from growing with N. Measured with
+scripts/benchmark_worker_memory.py (EfficientNetB0), a worker that loads its
+own model adds 346 MiB (tflite int8) to 643 MiB (keras) of PSS, almost all of
+it the TensorFlow runtime; a remote worker adds about 20 MiB, or 80 MiB with
+the whole API around it.
+
+Usage:
+    python scripts/serve_api.py --workers 4
+    INFERENCE_BACKEND=tflite python scripts/serve_api.py --workers 8 --port 8517
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.utils.predictor import FurniturePredictor
+from src.utils.tflite_export import tflite_model_path
+
+# A process that dies sooner than this after starting counts as a failed start; restarts
+# back off exponentially up to MAX_RESTART_DELAY, and the launcher gives up after
+# MAX_FAST_FAILURES failed starts in a row
+FAST_FAILURE_SECONDS = 30
+MAX_FAST_FAILURES = 5
+MAX_RESTART_DELAY = 30
+
+INFERENCE_SERVER = 'Inference server'
+
+
+def cpu_slices(num_workers):
+    """Split the CPUs this process may use into one contiguous slice per worker"""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cpus) // num_workers)
+    slices = []
+    for index in range(num_workers):
+        start = (index * per_worker) % len(cpus)
+        slices.append(cpus[start:start + per_worker])
+    return slices
+
+
+def prepare_tflite_model(model_path, quantization):
+    """Export the .tflite model in a child process if it is missing or stale, so the
+    inference server does not keep the converter's full TensorFlow import around"""
+    tflite_path = tflite_model_path(model_path, quantization)
+    source_path = FurniturePredictor.export_source_path(model_path)
+    if FurniturePredictor.export_is_current(tflite_path, source_path):
+        return True
+    print(f"Exporting {tflite_path} before starting the inference server...")
+    result = subprocess.run([
+        sys.executable, os.path.join(ROOT_DIR, 'src', 'utils', 'tflite_export.py'),
+        '--source', source_path,
+        '--output', tflite_path,
+        '--quantization', quantization
+    ], cwd=ROOT_DIR)
+    return result.returncode == 0
+
+
+def run_inference_server(address, authkey):
+    """Body of the forked inference server: load the model once and serve forward passes"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    from src.utils.inference_server import serve, server_predictor
+    serve(server_predictor(), address, authkey)
+
+
+def run_worker(index, sock, cpus, address, authkey, args):
+    """Body of a forked HTTP worker: pin CPUs, point the app at the inference server and serve"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    # Read by simple_api when it is imported below
+    os.environ['INFERENCE_BACKEND'] = 'remote'
+    os.environ['INFERENCE_SERVER_ADDRESS'] = address
+    os.environ['INFERENCE_SERVER_AUTHKEY'] = authkey.hex()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    import uvicorn
+    sys.path.append(os.path.join(ROOT_DIR, 'scripts'))
+    import simple_api
+    # Wait for the inference server before accepting on the shared socket, so a worker
+    # that cannot predict yet never takes connections away from the ready ones
+    simple_api.load_predictor()
+    if simple_api.predictor is None or not simple_api.predictor.ready:
+        raise RuntimeError(f"Worker {index} could not reach the inference server")
+    app = simple_api.app
+
+    print(f"Worker {index} (pid {os.getpid()}) serving on CPUs {cpus}")
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the furniture API from N workers sharing one inference server")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8517)))
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--keep-alive', type=int, default=5)
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+    backend = os.environ.get('INFERENCE_BACKEND', 'keras')
+    if backend == 'tflite':
+        quantization = os.environ.get('TFLITE_QUANTIZATION', 'float16')
+        if not prepare_tflite_model(os.path.join(ROOT_DIR, 'models', 'best_furniture_model.h5'), quantization):
+            print("Error: TFLite export failed")
+            return False
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+
+    # Private directory and random key: only processes forked from here may talk to the server
+    socket_dir = tempfile.mkdtemp(prefix='furniture-inference-')
+    address = os.path.join(socket_dir, 'inference.sock')
+    authkey = os.urandom(32)
+
+    slices = cpu_slices(args.workers)
+    targets = {INFERENCE_SERVER: lambda: run_inference_server(address, authkey)}
+    for index in range(args.workers):
+        targets[f"Worker {index}"] = (lambda index=index: run_worker(index, sock, slices[index], address, authkey, args))
+    processes = {}
+    started_at = {}
+    fast_failures = {}
+    stopping = False
+    failed = False
+
+    def spawn(name):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                targets[name]()
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+        processes[pid] = name
+        started_at[name] = time.monotonic()
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(processes):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Starting the inference server and {args.workers} workers on {args.host}:{args.port}")
+    for name in targets:
+        spawn(name)
+
+    while processes:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        name = processes.pop(pid, None)
+        if name is None or stopping:
+            continue
+
+        exit_code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - started_at[name] < FAST_FAILURE_SECONDS:
+            fast_failures[name] = fast_failures.get(name, 0) + 1
+        else:
+            fast_failures[name] = 1
+        if fast_failures[name] >= MAX_FAST_FAILURES:
+            print(f"Error: {name} failed {fast_failures[name]} times in a row within "
+                  f"{FAST_FAILURE_SECONDS}s of starting (last exit code {exit_code}), shutting down")
+            stop()
+            failed = True
+            continue
+        delay = min(2 ** (fast_failures[name] - 1), MAX_RESTART_DELAY)
+        print(f"Warning: {name} (pid {pid}) exited with code {exit_code}, restarting in {delay}s")
+        time.sleep(delay)
+        if not stopping:
+            spawn(name)
+
+    sock.close()
+    shutil.rmtree(socket_dir, ignore_errors=True)
+    return not failed
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -4,30 +4,157 @@ Simple FastAPI server for furniture classification - designed for load testing
 """
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 import uvicorn
-from PIL import Image
-import io
+import asyncio
 import sys
+import threading
 import os
+import io
+import json
+import zipfile
+import numpy as np
 
-# Add src to Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+# Add the project root to the Python path so the src package resolves
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.furniture_predictor import FurniturePredictor
-from utils.database import FurnitureDB
+from src.utils.predictor import FurniturePredictor
+from src.utils.database import FurnitureDB
+from src.utils.prediction_cache import get_prediction_cache
+from src.utils.prediction_log import get_prediction_log_writer
+from src.utils.metrics import QUEUE_DEPTH, get_metrics_registry, stage_timer
 
 app = FastAPI(title="Furniture Classification API", version="1.0.0")
 
-# Initialize components
+# Batch endpoint limits: files per request and images per forward pass
+MAX_BATCH_FILES = int(os.environ.get('API_MAX_BATCH_FILES', 1000))
+# Byte limits on images after zip expansion, per image and per request
+MAX_IMAGE_BYTES = int(os.environ.get('API_MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+MAX_BATCH_BYTES = int(os.environ.get('API_MAX_BATCH_BYTES', 512 * 1024 * 1024))
+BATCH_CHUNK_SIZE = int(os.environ.get('API_BATCH_CHUNK_SIZE', 64))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+decode_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="batch-decode")
+
+# Decoding and forward passes run on this bounded pool, never on the event loop. Its size
+# caps how many requests reach the micro-batcher at once, so keep it >= the batch size.
+# Micro-batcher size for concurrent /predict calls; warm-up covers it and BATCH_CHUNK_SIZE
+MICRO_BATCH_SIZE = int(os.environ.get('API_MICRO_BATCH_SIZE', 16))
+
+INFERENCE_WORKERS = int(os.environ.get('API_INFERENCE_WORKERS', 16))
+# Requests admitted (running or waiting for a worker) before new ones get 503
+MAX_PENDING_REQUESTS = int(os.environ.get('API_MAX_PENDING_REQUESTS', INFERENCE_WORKERS * 4))
+RETRY_AFTER_SECONDS = os.environ.get('API_RETRY_AFTER_SECONDS', '1')
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+class AdmissionControl:
+    """Counts admitted inference requests; only touched from the event loop thread"""
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.pending = 0
+        self.admitted = 0
+        self.rejected = 0
+    
+    def admit(self):
+        if self.pending >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is at capacity, retry later",
+                headers={"Retry-After": RETRY_AFTER_SECONDS}
+            )
+        self.pending += 1
+        self.admitted += 1
+    
+    def release(self):
+        self.pending -= 1
+    
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "limit": self.limit,
+            "workers": INFERENCE_WORKERS,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+admission = AdmissionControl(MAX_PENDING_REQUESTS)
+QUEUE_DEPTH.labels(queue='admission').set_function(lambda: admission.pending)
+
+async def run_inference(fn, *args):
+    """Run blocking decode/inference work on the inference pool"""
+    return await asyncio.wrap_future(inference_pool.submit(fn, *args))
+
+# Initialize components; the model itself is loaded and warmed up by load_predictor()
+# INFERENCE_BACKEND=remote (set by scripts/serve_api.py) hands forward passes to the
+# inference server at INFERENCE_SERVER_ADDRESS, which batches across all workers itself
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
 try:
-    predictor = FurniturePredictor()
+    predictor = FurniturePredictor(
+        use_batching=INFERENCE_BACKEND != 'remote',
+        max_batch_size=MICRO_BATCH_SIZE,
+        warmup_batch_sizes=(1, MICRO_BATCH_SIZE, BATCH_CHUNK_SIZE),
+        backend=INFERENCE_BACKEND,
+        call_strategy=os.environ.get('INFERENCE_CALL_STRATEGY', 'function'),
+        quantization=os.environ.get('TFLITE_QUANTIZATION', 'float16'),
+        cache=get_prediction_cache(),
+        cascade_model_path=os.environ.get('CASCADE_MODEL_PATH') or None,
+        cascade_threshold=float(os.environ.get('CASCADE_THRESHOLD', 0.9)),
+        num_threads=int(os.environ['INFERENCE_NUM_THREADS']) if os.environ.get('INFERENCE_NUM_THREADS') else None,
+        server_address=os.environ.get('INFERENCE_SERVER_ADDRESS'),
+        server_authkey=bytes.fromhex(os.environ.get('INFERENCE_SERVER_AUTHKEY', ''))
+    )
     db = FurnitureDB()
+    prediction_log = get_prediction_log_writer(db)
     print(" API components initialized successfully")
 except Exception as e:
     print(f" Failed to initialize components: {e}")
     predictor = None
     db = None
+    prediction_log = None
+
+model_load_error = None
+_load_lock = threading.Lock()
+
+def load_predictor():
+    """Load and warm up the model (blocking); safe to call more than once"""
+    global model_load_error
+    with _load_lock:
+        if predictor is None or predictor.ready:
+            return
+        model_load_error = None
+        if not predictor.load_model():
+            model_load_error = "model could not be loaded"
+            print(f" Failed to load model: {model_load_error}")
+
+@app.on_event("startup")
+def start_model_loading():
+    """Load in the background so /health can report warm-up progress instead of refusing connections"""
+    if predictor is not None and not predictor.ready:
+        threading.Thread(target=load_predictor, name="model-loader", daemon=True).start()
+
+def require_ready():
+    """Reject inference requests until the model is loaded and warmed up"""
+    if not predictor:
+        raise HTTPException(status_code=500, detail="Predictor not initialized")
+    if not predictor.ready:
+        if model_load_error:
+            raise HTTPException(status_code=500, detail=f"Model unavailable: {model_load_error}")
+        raise HTTPException(
+            status_code=503,
+            detail="Model is warming up, retry later",
+            headers={"Retry-After": RETRY_AFTER_SECONDS}
+        )
+
+@app.on_event("shutdown")
+def flush_prediction_log():
+    """Write queued prediction logs before the worker exits"""
+    if prediction_log:
+        prediction_log.stop()
 
 @app.get("/")
 async def root():
@@ -35,46 +162,249 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
+    """200 once the model is warmed up, 503 before that, so load balancers can gate traffic on it"""
+    ready = predictor is not None and predictor.ready
+    if ready:
+        status = "healthy"
+    elif predictor is None or model_load_error:
+        status = "unhealthy"
+    else:
+        status = "warming_up"
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": status,
+        "ready": ready,
         "predictor_loaded": predictor is not None,
-        "database_connected": db is not None
-    }
+        "database_connected": db is not None,
+        "prediction_cache": get_prediction_cache().stats(),
+        "cascade": predictor.cascade_stats() if predictor else None,
+        "prediction_log": prediction_log.stats() if prediction_log else None,
+        "admission": admission.stats()
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage latency histograms, batch sizes, queue depths and model info for Prometheus"""
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.post("/predict")
 async def predict_furniture(file: UploadFile = File(...)):
     """Predict furniture type from uploaded image"""
-    if not predictor:
-        raise HTTPException(status_code=500, detail="Predictor not initialized")
-    
+    require_ready()
+    admission.admit()
     try:
-        # Read and validate image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Make prediction
-        prediction, confidence = predictor.predict(image)
+        # Decode the upload in memory; repeated uploads are served from the prediction cache
+        with stage_timer('upload_read'):
+            contents = await read_upload(file, MAX_IMAGE_BYTES)
+        result = await run_inference(predictor.predict_bytes, contents)
+        if result is None:
+            raise HTTPException(status_code=500, detail="Prediction failed")
         
-        # Log prediction to database
-        if db:
-            try:
-                db.log_prediction(prediction, confidence, file.filename)
-            except Exception as e:
-                print(f"Warning: Failed to log prediction to database: {e}")
+        # Queue the prediction for the background log writer
+        if prediction_log:
+            prediction_log.log(
+                image_path=file.filename,
+                predicted_class=result['predicted_class'],
+                confidence=result['confidence']
+            )
         
         return {
-            "prediction": prediction,
-            "confidence": float(confidence),
+            "prediction": result['predicted_class'],
+            "confidence": float(result['confidence']),
             "filename": file.filename,
             "status": "success"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    finally:
+        admission.release()
+
+def expand_uploads(uploads):
+    """Turn (filename, bytes) uploads into (filename, image bytes) items, expanding zip archives
+    
+    Entry counts and declared sizes are checked against the limits before anything is
+    decompressed, and each member is read with a cap in case its header understates it.
+    """
+    items = []
+    total_bytes = 0
+    
+    def add(filename, size):
+        nonlocal total_bytes
+        if len(items) >= MAX_BATCH_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FILES} images per request")
+        if size > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"{filename} is larger than {MAX_IMAGE_BYTES} bytes")
+        total_bytes += size
+        if total_bytes > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"Images in a request may total at most {MAX_BATCH_BYTES} bytes")
+    
+    for filename, contents in uploads:
+        if not zipfile.is_zipfile(io.BytesIO(contents)):
+            add(filename, len(contents))
+            items.append((filename, contents))
+            continue
+        with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+            members = [info for info in archive.infolist()
+                       if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)]
+            if len(items) + len(members) > MAX_BATCH_FILES:
+                raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FILES} images per request")
+            for info in members:
+                add(f"{filename}!{info.filename}", info.file_size)
+            for info in members:
+                with archive.open(info) as member:
+                    data = member.read(info.file_size + 1)
+                if len(data) > info.file_size:
+                    raise HTTPException(status_code=413, detail=f"{filename}!{info.filename} is larger than its zip header says")
+                items.append((f"{filename}!{info.filename}", data))
+    if not items:
+        raise HTTPException(status_code=400, detail="No images in request")
+    return items
+
+UPLOAD_READ_CHUNK = 1024 * 1024
+
+async def read_upload(upload, limit, budget=None):
+    """Read an upload chunk by chunk, failing with 413 as soon as it passes ``limit``
+    
+    Starlette spools the request body to a temporary file; this keeps an oversized
+    upload from being copied into memory whole. A zip archive may use the whole
+    ``budget`` (the request total left) instead of the per-image ``limit``.
+    """
+    first = await upload.read(UPLOAD_READ_CHUNK)
+    detail = f"{upload.filename} is larger than {limit} bytes"
+    if budget is not None and (first.startswith(b'PK\x03\x04') or budget < limit):
+        limit = budget
+        detail = f"Uploads in a request may total at most {MAX_BATCH_BYTES} bytes"
+    if upload.size is not None and upload.size > limit:
+        raise HTTPException(status_code=413, detail=detail)
+    
+    chunks, size = [first], len(first)
+    while size <= limit:
+        chunk = await upload.read(UPLOAD_READ_CHUNK)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    if size > limit:
+        raise HTTPException(status_code=413, detail=detail)
+    return b''.join(chunks)
+
+async def read_batch_uploads(files):
+    """Read uploaded files into (filename, bytes) pairs; zip expansion runs on the inference pool"""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FILES} images per request")
+    uploads = []
+    budget = MAX_BATCH_BYTES
+    for upload in files:
+        with stage_timer('upload_read'):
+            contents = await read_upload(upload, MAX_IMAGE_BYTES, budget)
+        budget -= len(contents)
+        uploads.append((upload.filename, contents))
+    return await run_inference(expand_uploads, uploads)
+
+def predict_chunk(items):
+    """Decode a chunk of uploads in parallel and classify them in one forward pass"""
+    cache = predictor.cache
+    keys = [cache.make_key(contents, predictor.model_version) if cache else None for _, contents in items]
+    cached = [cache.get(key) if cache else None for key in keys]
+    
+    def decode(contents):
+        try:
+            return predictor.preprocess_image(io.BytesIO(contents)), None
+        except Exception as e:
+            return None, f"Could not decode image ({type(e).__name__})"
+    
+    misses = [i for i, result in enumerate(cached) if result is None]
+    decoded = list(decode_pool.map(decode, [items[i][1] for i in misses]))
+    valid = [i for i, (array, _) in zip(misses, decoded) if array is not None]
+    if valid:
+        batch = np.stack([array for array, _ in decoded if array is not None])
+        for i, result in zip(valid, predictor.predict_preprocessed_batch(batch, BATCH_CHUNK_SIZE)):
+            cached[i] = result
+            if cache:
+                cache.put(keys[i], result)
+    errors = {i: error for i, (array, error) in zip(misses, decoded) if array is None}
+    
+    responses = []
+    for i, (filename, _) in enumerate(items):
+        if i in errors:
+            responses.append({"filename": filename, "status": "error", "detail": errors[i]})
+            continue
+        result = cached[i]
+        if prediction_log:
+            prediction_log.log(
+                image_path=filename,
+                predicted_class=result['predicted_class'],
+                confidence=result['confidence']
+            )
+        responses.append({
+            "prediction": result['predicted_class'],
+            "confidence": float(result['confidence']),
+            "filename": filename,
+            "status": "success"
+        })
+    return responses
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """Predict many images (multipart files and/or zip archives) in batched forward passes"""
+    require_ready()
+    admission.admit()
+    try:
+        items = await read_batch_uploads(files)
+        results = []
+        for start in range(0, len(items), BATCH_CHUNK_SIZE):
+            results.extend(await run_inference(predict_chunk, items[start:start + BATCH_CHUNK_SIZE]))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    finally:
+        admission.release()
+    
+    return {
+        "results": results,
+        "count": len(results),
+        "status": "success"
+    }
+
+@app.post("/predict/stream")
+async def predict_stream(files: List[UploadFile] = File(...)):
+    """Like /predict/batch, but streams one NDJSON line per image as each chunk finishes"""
+    require_ready()
+    admission.admit()
+    released = False
+    
+    def release_once():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+    
+    try:
+        items = await read_batch_uploads(files)
+    except BaseException:
+        release_once()
+        raise
+    
+    async def generate():
+        # The admission slot is held until the last line is sent
+        try:
+            for start in range(0, len(items), BATCH_CHUNK_SIZE):
+                chunk = items[start:start + BATCH_CHUNK_SIZE]
+                try:
+                    results = await run_inference(predict_chunk, chunk)
+                except Exception as e:
+                    results = [{"filename": filename, "status": "error", "detail": f"Prediction failed: {str(e)}"}
+                               for filename, _ in chunk]
+                for result in results:
+                    yield json.dumps(result) + "\n"
+        finally:
+            release_once()
+    
+    # The background task covers a client that disconnects before streaming starts
+    return StreamingResponse(generate(), media_type="application/x-ndjson", background=BackgroundTask(release_once))
 
 @app.get("/analytics")  
 async def get_analytics():
@@ -83,8 +413,14 @@ async def get_analytics():
         raise HTTPException(status_code=500, detail="Database not available")
     
     try:
-        # Get analytics data
-        analytics = db.get_analytics()
+        # Off the event loop, on the default pool rather than the inference pool
+        stats = await run_in_threadpool(db.get_prediction_stats)
+        analytics = {
+            "total_predictions": int(stats['total_predictions']),
+            "class_predictions": stats['class_predictions'].to_dict(orient='records'),
+            "predictions_over_time": stats['predictions_over_time'].to_dict(orient='records'),
+            "avg_confidence": stats['avg_confidence'].to_dict(orient='records')
+        }
         return {
             "analytics": analytics,
             "status": "success"
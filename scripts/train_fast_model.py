@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Train the MobileNetV2 model used as the fast first stage of the inference cascade
+
+The model is trained on the same combined training data as the Retrain page
+and saved to models/furniture_model_fast.h5. Enable the cascade with:
+
+    CASCADE_MODEL_PATH=models/furniture_model_fast.h5 CASCADE_THRESHOLD=0.9 streamlit run app.py
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.database import FurnitureDB
+from src.utils.trainer import FurnitureModelTrainer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fast cascade model")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--output', default='models/furniture_model_fast.h5')
+    parser.add_argument('--db-path', default='database/furniture_classification.db')
+    args = parser.parse_args()
+
+    db = FurnitureDB(args.db_path)
+    requirements_met, message = db.check_training_data_requirements()
+    if not requirements_met:
+        print(f"Cannot train: {message}")
+        return False
+
+    combined_data = db.get_combined_training_data()
+    trainer = FurnitureModelTrainer()
+    results = trainer.train_model(
+        combined_data,
+        epochs=args.epochs,
+        model_save_path=args.output,
+        backbone='mobilenetv2'
+    )
+    print(f"Fast model saved to {results['model_path']} (val accuracy {results['final_accuracy']:.3f})")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,137 @@
+"""
+Dynamic micro-batching for model inference
+
+Concurrent callers submit single preprocessed images; a background thread
+collects them into one batch (up to ``max_batch_size`` images or until
+``max_wait_ms`` has passed since the first queued request), runs a single
+forward pass and hands each row of the output back to its caller.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10, name="micro-batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring how well requests are being coalesced
+        self.batches_run = 0
+        self.items_processed = 0
+        self.largest_batch = 0
+
+    def start(self):
+        """Start the background batching thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the batching thread after draining requests already queued"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop_event.set()
+        self._queue.put(None)  # wake the worker if it is blocked on an empty queue
+        thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, image_array):
+        """Queue one preprocessed image of shape (H, W, C); returns a Future for its output row"""
+        if not self.running:
+            self.start()
+        future = Future()
+        self._queue.put((np.asarray(image_array, dtype=np.float32), future))
+        return future
+
+    def predict(self, image_array, timeout=None):
+        """Blocking helper around ``submit``"""
+        return self.submit(image_array).result(timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'batches_run': self.batches_run,
+            'items_processed': self.items_processed,
+            'largest_batch': self.largest_batch,
+            'average_batch_size': (self.items_processed / self.batches_run) if self.batches_run else 0.0,
+            'queue_depth': self.queue_depth(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the deadline passes"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop sentinel: finish this batch, the loop exits afterwards
+                self._stop_event.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._process(batch)
+            if self._stop_event.is_set() and self._queue.empty():
+                break
+
+    def _process(self, batch):
+        # Skip requests whose callers already gave up
+        batch = [(array, future) for array, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            inputs = np.stack([array for array, _ in batch])
+            outputs = np.asarray(self.predict_fn(inputs))
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"Model returned {len(outputs)} rows for a batch of {len(batch)}")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.items_processed += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        for row, (_, future) in zip(outputs, batch):
+            future.set_result(row)
@@ -5,15 +5,71 @@ import os
 from datetime import datetime
 import pickle
 import json
+import shutil
+import tempfile
+import itertools
+
+from src.utils.db_pool import get_connection_pool
+
+CLASS_NAMES = ['Almirah', 'Chair', 'Fridge', 'Table', 'TV']
+
+# Stored class labels (as uploaded or as in the original dataset) -> (class name, class id)
+CLASS_MAPPING = {
+    'almirah': ('Almirah', 0),
+    'chair': ('Chair', 1),
+    'fridge': ('Fridge', 2),
+    'table': ('Table', 3),
+    'tv': ('TV', 4),
+    'Almirah': ('Almirah', 0),
+    'Chair': ('Chair', 1),
+    'Fridge': ('Fridge', 2),
+    'Table': ('Table', 3),
+    'TV': ('TV', 4)
+}
+
+# Schema migrations applied in order on top of the base tables; the database's
+# PRAGMA user_version records the last one applied. Append new entries, never edit old ones.
+MIGRATIONS = [
+    (1, "Secondary indexes for analytics, training data and session lookups", [
+        # Covers get_combined_training_data (dataset_type = 'train') and the per-class
+        # counts in get_training_data_stats without touching the table rows
+        '''CREATE INDEX IF NOT EXISTS idx_training_data_type_class
+           ON training_data (dataset_type, class_name, class_id, image_path)''',
+        '''CREATE INDEX IF NOT EXISTS idx_user_data_class
+           ON user_data (class_name)''',
+        '''CREATE INDEX IF NOT EXISTS idx_predictions_class_confidence
+           ON predictions (predicted_class, confidence)''',
+        # Expression index: only used by queries written as DATE(prediction_time)
+        '''CREATE INDEX IF NOT EXISTS idx_predictions_date
+           ON predictions (DATE(prediction_time))''',
+        '''CREATE INDEX IF NOT EXISTS idx_retraining_sessions_created_at
+           ON retraining_sessions (created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_model_metrics_session
+           ON model_metrics (session_id, metric_name)''',
+        '''CREATE INDEX IF NOT EXISTS idx_training_jobs_status
+           ON training_jobs (status, created_at)''',
+    ]),
+    (2, "Record which worker process owns a running training job", [
+        'ALTER TABLE training_jobs ADD COLUMN worker_pid INTEGER',
+    ]),
+]
 
 class FurnitureDB:
     def __init__(self, db_path='database/furniture_classification.db'):
         self.db_path = db_path
-        self.init_database()
+        # Retraining uploads are kept next to the database until the user rows are cleared
+        self.user_uploads_dir = os.path.join(os.path.dirname(db_path), 'user_uploads')
+        self.pool = get_connection_pool(db_path)
+        # Schema creation runs once per database file per process, not per instance
+        self.pool.ensure_schema(self.init_database)
+    
+    def _connect(self):
+        """This thread's pooled connection; callers commit but never close it"""
+        return self.pool.connection()
     
     def init_database(self):
         """Initialize the SQLite database with required tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -75,51 +131,196 @@ class FurnitureDB:
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS training_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_name TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                epochs INTEGER NOT NULL,
+                use_embedding_cache INTEGER DEFAULT 0,
+                model_path TEXT NOT NULL,
+                current_epoch INTEGER DEFAULT 0,
+                progress REAL DEFAULT 0,
+                message TEXT,
+                last_metrics TEXT,
+                cancel_requested INTEGER DEFAULT 0,
+                session_id INTEGER,
+                final_accuracy REAL,
+                training_time_minutes REAL,
+                total_data_count INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES retraining_sessions (id)
+            )
+        ''')
+        
         conn.commit()
-        conn.close()
+        self._init_prediction_rollups(conn)
+        self._apply_migrations(conn)
         print("Database initialized successfully!")
     
+    def _apply_migrations(self, conn):
+        """Apply MIGRATIONS newer than the database's user_version, one transaction each"""
+        cursor = conn.cursor()
+        for version, description, statements in MIGRATIONS:
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-read under the write lock in case another process migrated first
+                current_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+                if version <= current_version:
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {int(version)}')
+                conn.commit()
+                print(f"Applied database migration {version}: {description}")
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def explain_query_plan(self, sql, params=()):
+        """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+        cursor = self._connect().cursor()
+        return [row[3] for row in cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+    
+    def _init_prediction_rollups(self, conn):
+        """Create the analytics rollup tables and the triggers that keep them in sync with predictions"""
+        cursor = conn.cursor()
+        # Write lock up front so no prediction lands between the backfill and the triggers
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('''
+                SELECT COUNT(*) FROM sqlite_master
+                WHERE type = 'table' AND name IN ('prediction_class_stats', 'prediction_daily_stats')
+            ''')
+            needs_backfill = cursor.fetchone()[0] < 2
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS prediction_class_stats (
+                    predicted_class TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    confidence_sum REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS prediction_daily_stats (
+                    date TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS predictions_rollup_insert
+                AFTER INSERT ON predictions
+                BEGIN
+                    INSERT INTO prediction_class_stats (predicted_class, count, confidence_sum)
+                    VALUES (NEW.predicted_class, 1, NEW.confidence)
+                    ON CONFLICT (predicted_class) DO UPDATE SET
+                        count = count + 1,
+                        confidence_sum = confidence_sum + excluded.confidence_sum;
+                    INSERT INTO prediction_daily_stats (date, count)
+                    VALUES (DATE(NEW.prediction_time), 1)
+                    ON CONFLICT (date) DO UPDATE SET count = count + 1;
+                END
+            ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS predictions_rollup_delete
+                AFTER DELETE ON predictions
+                BEGIN
+                    UPDATE prediction_class_stats
+                    SET count = count - 1, confidence_sum = confidence_sum - OLD.confidence
+                    WHERE predicted_class = OLD.predicted_class;
+                    UPDATE prediction_daily_stats SET count = count - 1
+                    WHERE date = DATE(OLD.prediction_time);
+                END
+            ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS predictions_rollup_update
+                AFTER UPDATE OF predicted_class, confidence, prediction_time ON predictions
+                BEGIN
+                    UPDATE prediction_class_stats
+                    SET count = count - 1, confidence_sum = confidence_sum - OLD.confidence
+                    WHERE predicted_class = OLD.predicted_class;
+                    UPDATE prediction_daily_stats SET count = count - 1
+                    WHERE date = DATE(OLD.prediction_time);
+                    INSERT INTO prediction_class_stats (predicted_class, count, confidence_sum)
+                    VALUES (NEW.predicted_class, 1, NEW.confidence)
+                    ON CONFLICT (predicted_class) DO UPDATE SET
+                        count = count + 1,
+                        confidence_sum = confidence_sum + excluded.confidence_sum;
+                    INSERT INTO prediction_daily_stats (date, count)
+                    VALUES (DATE(NEW.prediction_time), 1)
+                    ON CONFLICT (date) DO UPDATE SET count = count + 1;
+                END
+            ''')
+            
+            if needs_backfill:
+                # One-time scan of the existing history; afterwards the triggers keep the rollups current
+                cursor.execute('DELETE FROM prediction_class_stats')
+                cursor.execute('DELETE FROM prediction_daily_stats')
+                cursor.execute('''
+                    INSERT INTO prediction_class_stats (predicted_class, count, confidence_sum)
+                    SELECT predicted_class, COUNT(*), SUM(confidence)
+                    FROM predictions
+                    GROUP BY predicted_class
+                ''')
+                cursor.execute('''
+                    INSERT INTO prediction_daily_stats (date, count)
+                    SELECT DATE(prediction_time), COUNT(*)
+                    FROM predictions
+                    GROUP BY DATE(prediction_time)
+                ''')
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
     def populate_original_data(self, paths_train, paths_val, paths_test, 
-                             y_train, y_val, y_test, class_names):
-        """Populate database with original training data"""
-        conn = sqlite3.connect(self.db_path)
+                             y_train, y_val, y_test, class_names, chunk_size=50000):
+        """Populate database with original training data
+        
+        Inputs may be memory-mapped (np.load(..., mmap_mode='r')); they are read
+        chunk by chunk and labels are decoded with one argmax per chunk. The delete
+        and every chunk form a single transaction, so a failed load leaves the old
+        catalog in place instead of a truncated one.
+        """
+        class_names = np.asarray(class_names)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        # Clear existing data
-        cursor.execute('DELETE FROM training_data WHERE dataset_type = "original"')
-        
-        data_to_insert = []
-        
-        # Add training data
-        for path, label_onehot in zip(paths_train, y_train):
-            class_id = np.argmax(label_onehot)
-            class_name = class_names[class_id]
-            data_to_insert.append((path, class_name, class_id, 'train'))
-        
-        # Add validation data
-        for path, label_onehot in zip(paths_val, y_val):
-            class_id = np.argmax(label_onehot)
-            class_name = class_names[class_id]
-            data_to_insert.append((path, class_name, class_id, 'val'))
-        
-        # Add test data
-        for path, label_onehot in zip(paths_test, y_test):
-            class_id = np.argmax(label_onehot)
-            class_name = class_names[class_id]
-            data_to_insert.append((path, class_name, class_id, 'test'))
-        
-        cursor.executemany('''
-            INSERT INTO training_data (image_path, class_name, class_id, dataset_type)
-            VALUES (?, ?, ?, ?)
-        ''', data_to_insert)
-        
-        conn.commit()
-        conn.close()
-        print(f"Populated database with {len(data_to_insert)} original training samples")
+        try:
+            # Clear existing data (earlier versions tagged rows 'original')
+            cursor.execute("DELETE FROM training_data WHERE dataset_type IN ('original', 'train', 'val', 'test')")
+            
+            total = 0
+            for paths, labels, dataset_type in ((paths_train, y_train, 'train'),
+                                                (paths_val, y_val, 'val'),
+                                                (paths_test, y_test, 'test')):
+                for start in range(0, len(paths), chunk_size):
+                    chunk_paths = np.asarray(paths[start:start + chunk_size]).astype(str)
+                    class_ids = np.argmax(np.asarray(labels[start:start + chunk_size]), axis=1)
+                    cursor.executemany('''
+                        INSERT INTO training_data (image_path, class_name, class_id, dataset_type)
+                        VALUES (?, ?, ?, ?)
+                    ''', zip(chunk_paths.tolist(), class_names[class_ids].tolist(),
+                             class_ids.tolist(), itertools.repeat(dataset_type)))
+                    total += len(chunk_paths)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        print(f"Populated database with {total} original training samples")
     
     def add_user_data(self, image_paths, class_names, class_ids, uploaded_by='user'):
         """Add user uploaded data for retraining"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         data_to_insert = []
@@ -132,13 +333,12 @@ class FurnitureDB:
         ''', data_to_insert)
         
         conn.commit()
-        conn.close()
         print(f"Added {len(data_to_insert)} user data samples")
     
     def log_prediction(self, image_path, predicted_class, confidence, 
                       true_class=None, model_version='v1.0'):
         """Log a prediction made by the model"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -147,12 +347,26 @@ class FurnitureDB:
         ''', (image_path, true_class, predicted_class, confidence, model_version))
         
         conn.commit()
-        conn.close()
+    
+    def log_predictions(self, records):
+        """Log many predictions in one transaction
+        
+        records: (image_path, true_class, predicted_class, confidence, model_version, prediction_time) tuples
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO predictions (image_path, true_class, predicted_class, confidence, model_version, prediction_time)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', records)
+        
+        conn.commit()
     
     def log_retraining_session(self, session_name, original_count, user_count, 
                              total_count, final_accuracy, training_time, model_path):
         """Log a retraining session"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -165,12 +379,11 @@ class FurnitureDB:
         
         session_id = cursor.lastrowid
         conn.commit()
-        conn.close()
         return session_id
     
     def log_metrics(self, session_id, metrics_dict):
         """Log performance metrics for a retraining session"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         data_to_insert = []
@@ -187,42 +400,43 @@ class FurnitureDB:
         ''', data_to_insert)
         
         conn.commit()
-        conn.close()
     
     def get_prediction_stats(self):
-        """Get prediction statistics for visualization"""
-        conn = sqlite3.connect(self.db_path)
+        """Get prediction statistics for visualization
+        
+        Reads the rollup tables maintained by the predictions triggers, so the cost
+        depends on the number of classes and days, not on the number of predictions.
+        """
+        conn = self._connect()
         
         # Total predictions
         total_predictions = pd.read_sql_query(
-            'SELECT COUNT(*) as total FROM predictions', conn
+            'SELECT COALESCE(SUM(count), 0) as total FROM prediction_class_stats', conn
         ).iloc[0]['total']
         
         # Predictions by class
         class_predictions = pd.read_sql_query('''
-            SELECT predicted_class, COUNT(*) as count 
-            FROM predictions 
-            GROUP BY predicted_class 
+            SELECT predicted_class, count
+            FROM prediction_class_stats
+            WHERE count > 0
             ORDER BY count DESC
         ''', conn)
         
         # Predictions over time
         predictions_over_time = pd.read_sql_query('''
-            SELECT DATE(prediction_time) as date, COUNT(*) as count
-            FROM predictions
-            GROUP BY DATE(prediction_time)
+            SELECT date, count
+            FROM prediction_daily_stats
+            WHERE count > 0
             ORDER BY date
         ''', conn)
         
         # Average confidence by class
         avg_confidence = pd.read_sql_query('''
-            SELECT predicted_class, AVG(confidence) as avg_confidence
-            FROM predictions
-            GROUP BY predicted_class
+            SELECT predicted_class, confidence_sum / count as avg_confidence
+            FROM prediction_class_stats
+            WHERE count > 0
         ''', conn)
         
-        conn.close()
-        
         return {
             'total_predictions': total_predictions,
             'class_predictions': class_predictions,
@@ -232,7 +446,7 @@ class FurnitureDB:
     
     def get_training_data_stats(self):
         """Get training data statistics"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         
         # Original data distribution
         original_data = pd.read_sql_query('''
@@ -256,7 +470,6 @@ class FurnitureDB:
             ORDER BY created_at DESC
         ''', conn)
         
-        conn.close()
         
         return {
             'original_data': original_data,
@@ -264,60 +477,36 @@ class FurnitureDB:
             'retraining_sessions': retraining_sessions
         }
     
+    def _combined_training_data_sql(self):
+        """SELECT over original train + user rows with class names normalized in SQL
+        
+        Rows whose class name is not recognised get a NULL class_name/class_id.
+        """
+        name_cases = ' '.join(f"WHEN '{raw}' THEN '{name}'" for raw, (name, _) in CLASS_MAPPING.items())
+        id_cases = ' '.join(f"WHEN '{raw}' THEN {class_id}" for raw, (_, class_id) in CLASS_MAPPING.items())
+        label = "TRIM(class_name, ' \t\r\n')"
+        return f'''
+            SELECT image_path,
+                   CASE {label} {name_cases} END AS class_name,
+                   CASE {label} {id_cases} END AS class_id
+            FROM (
+                SELECT image_path, class_name FROM training_data WHERE dataset_type = 'train'
+                UNION ALL
+                SELECT image_path, class_name FROM user_data
+            )
+        '''
+    
     def get_combined_training_data(self):
         """Get combined training data (original + user) for retraining"""
-        conn = sqlite3.connect(self.db_path)
-        
-        # Get original training data
-        original_data = pd.read_sql_query('''
-            SELECT image_path, class_name, class_id
-            FROM training_data
-            WHERE dataset_type = 'train'
-        ''', conn)
-        
-        # Get user data
-        user_data = pd.read_sql_query('''
-            SELECT image_path, class_name, class_id
-            FROM user_data
-        ''', conn)
-        
-        conn.close()
-        
-        # Combine datasets
-        if len(user_data) > 0:
-            combined_data = pd.concat([original_data, user_data], ignore_index=True)
-        else:
-            combined_data = original_data
-        
-        # Normalize class names and ensure consistent class IDs
-        class_mapping = {
-            'almirah': ('Almirah', 0),
-            'chair': ('Chair', 1), 
-            'fridge': ('Fridge', 2),
-            'table': ('Table', 3),
-            'tv': ('TV', 4),
-            # Handle capitalized versions
-            'Almirah': ('Almirah', 0),
-            'Chair': ('Chair', 1),
-            'Fridge': ('Fridge', 2), 
-            'Table': ('Table', 3),
-            'TV': ('TV', 4)
-        }
+        conn = self._connect()
+        combined_data = pd.read_sql_query(self._combined_training_data_sql(), conn)
         
-        # Clean and normalize the data
-        valid_rows = []
-        for idx, row in combined_data.iterrows():
-            class_name = str(row['class_name']).strip()
-            if class_name in class_mapping:
-                normalized_name, correct_id = class_mapping[class_name]
-                valid_rows.append({
-                    'image_path': row['image_path'],
-                    'class_name': normalized_name,
-                    'class_id': correct_id
-                })
-        
-        # Create cleaned DataFrame
-        cleaned_data = pd.DataFrame(valid_rows)
+        # Drop rows with unrecognised class names and use compact dtypes; the categories
+        # are only the classes present so value_counts() does not report empty classes
+        cleaned_data = combined_data.dropna(subset=['class_name']).reset_index(drop=True)
+        present_classes = [name for name in CLASS_NAMES if name in set(cleaned_data['class_name'])]
+        cleaned_data['class_name'] = pd.Categorical(cleaned_data['class_name'], categories=present_classes)
+        cleaned_data['class_id'] = cleaned_data['class_id'].astype(np.int8)
         
         print(f"Original combined data: {len(combined_data)} samples")  
         print(f"Cleaned data: {len(cleaned_data)} samples")
@@ -330,32 +519,45 @@ class FurnitureDB:
     
     def check_training_data_requirements(self):
         """Check if combined data meets minimum training requirements"""
-        combined_data = self.get_combined_training_data()
+        conn = self._connect()
+        cursor = conn.cursor()
+        # Aggregate in SQL instead of loading every row
+        class_counts = dict(cursor.execute(f'''
+            SELECT class_name, COUNT(*)
+            FROM ({self._combined_training_data_sql()})
+            WHERE class_name IS NOT NULL
+            GROUP BY class_name
+        ''').fetchall())
+        total = sum(class_counts.values())
         
-        if len(combined_data) < 10:
-            return False, f"Need at least 10 total images, currently have {len(combined_data)}"
+        if total < 10:
+            return False, f"Need at least 10 total images, currently have {total}"
         
         # Check class distribution
-        class_counts = combined_data['class_name'].value_counts()
-        min_samples = class_counts.min()  if len(class_counts) > 0 else 0
+        min_samples = min(class_counts.values()) if class_counts else 0
         
         if min_samples < 2:
-            problematic_classes = class_counts[class_counts < 2].index.tolist() if len(class_counts) > 0 else []
+            problematic_classes = [name for name, count in class_counts.items() if count < 2]
             return False, f"Classes with insufficient data (need ≥2 each): {', '.join(problematic_classes)}"
         
         return True, "Training data requirements met"
     
+    def create_user_upload_dir(self, prefix):
+        """Create a new, uniquely named directory for one batch of retraining uploads"""
+        os.makedirs(self.user_uploads_dir, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f"{prefix}_", dir=self.user_uploads_dir)
+    
     def clear_user_data(self):
-        """Clear user uploaded data"""
-        conn = sqlite3.connect(self.db_path)
+        """Clear user uploaded data and the uploaded image files"""
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM user_data')
         conn.commit()
-        conn.close()
+        shutil.rmtree(self.user_uploads_dir, ignore_errors=True)
     
     def get_all_training_sessions(self):
         """Get all training sessions with detailed information"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         
         # Get all retraining sessions
         sessions = pd.read_sql_query('''
@@ -383,9 +585,140 @@ class FurnitureDB:
             FROM model_metrics
         ''', conn)
         
-        conn.close()
         
         return {
             'sessions': sessions,
             'metrics': metrics
         }
+    
+    def submit_training_job(self, session_name, epochs, model_path, use_embedding_cache=False):
+        """Queue a retraining job for the background training worker"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO training_jobs (session_name, epochs, model_path, use_embedding_cache, message)
+            VALUES (?, ?, ?, ?, 'Waiting for training worker')
+        ''', (session_name, epochs, model_path, int(bool(use_embedding_cache))))
+        
+        job_id = cursor.lastrowid
+        conn.commit()
+        return job_id
+    
+    def claim_next_training_job(self, worker_pid=None):
+        """Atomically mark the oldest queued job as running, owned by worker_pid
+        (default: this process), and return it"""
+        worker_pid = os.getpid() if worker_pid is None else worker_pid
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        try:
+            # IMMEDIATE takes the write lock up front so two workers cannot claim the same job
+            cursor.execute('BEGIN IMMEDIATE')
+            row = cursor.execute('''
+                SELECT * FROM training_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at, id
+                LIMIT 1
+            ''').fetchone()
+            if row is None:
+                conn.commit()
+                return None
+            cursor.execute('''
+                UPDATE training_jobs
+                SET status = 'running', started_at = CURRENT_TIMESTAMP, message = 'Preparing training data',
+                    worker_pid = ?
+                WHERE id = ?
+            ''', (worker_pid, row['id']))
+            conn.commit()
+            job = dict(row)
+            job['status'] = 'running'
+            job['worker_pid'] = worker_pid
+            return job
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def update_training_job(self, job_id, **fields):
+        """Update progress/status columns of a training job"""
+        if not fields:
+            return
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(f'UPDATE training_jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+        conn.commit()
+    
+    def finish_training_job(self, job_id, status, message, **fields):
+        """Move a job to a terminal status (completed, failed or cancelled)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        columns = ''.join(f", {name} = ?" for name in fields)
+        cursor.execute(f'''
+            UPDATE training_jobs
+            SET status = ?, message = ?, finished_at = CURRENT_TIMESTAMP{columns}
+            WHERE id = ?
+        ''', (status, message, *fields.values(), job_id))
+        conn.commit()
+    
+    def get_training_job(self, job_id):
+        """Get one training job as a dict, or None"""
+        cursor = self._connect().cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute('SELECT * FROM training_jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def get_active_training_job(self):
+        """Get the most recent queued or running job, or None"""
+        cursor = self._connect().cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute('''
+            SELECT * FROM training_jobs
+            WHERE status IN ('queued', 'running')
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+        ''').fetchone()
+        return dict(row) if row else None
+    
+    def request_training_job_cancellation(self, job_id):
+        """Ask the worker to stop a job; queued jobs are cancelled immediately"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE training_jobs
+            SET status = 'cancelled', message = 'Cancelled before training started',
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'queued'
+        ''', (job_id,))
+        cursor.execute('''
+            UPDATE training_jobs SET cancel_requested = 1, message = 'Cancelling...'
+            WHERE id = ? AND status = 'running'
+        ''', (job_id,))
+        conn.commit()
+    
+    def is_training_job_cancel_requested(self, job_id):
+        """Check whether cancellation was requested for a running job"""
+        conn = self._connect()
+        row = conn.execute('SELECT cancel_requested FROM training_jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+    
+    def fail_interrupted_training_jobs(self, owner_alive):
+        """Mark running jobs whose worker is gone as failed; owner_alive(pid) says
+        whether a claiming worker is still alive (jobs with no recorded owner count as gone)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            rows = cursor.execute("SELECT id, worker_pid FROM training_jobs WHERE status = 'running'").fetchall()
+            orphaned = [(job_id,) for job_id, pid in rows if pid is None or not owner_alive(pid)]
+            cursor.executemany('''
+                UPDATE training_jobs
+                SET status = 'failed', message = 'Training worker stopped unexpectedly',
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'running'
+            ''', orphaned)
+            conn.commit()
+            return len(orphaned)
+        except Exception:
+            conn.rollback()
+            raise
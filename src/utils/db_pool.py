@@ -0,0 +1,115 @@
+"""
+Per-thread SQLite connection pool
+
+Opening a connection, applying pragmas and checking the schema on every
+FurnitureDB call costs more than most of the queries themselves. The pool
+keeps one connection per thread (sqlite3 connections must not be shared
+between threads) and reuses it until the thread exits, runs the database in
+WAL mode so readers never wait on the writer, and makes sure the schema is
+created only once per database file per process.
+"""
+import os
+import sqlite3
+import threading
+import weakref
+
+# Applied to every new connection. journal_mode=WAL is persistent in the file;
+# the others are per-connection.
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',      # durable at checkpoints; safe with WAL
+    'PRAGMA cache_size=-16000',       # 16 MB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+
+class _ThreadConnection:
+    __slots__ = ('conn', 'pid', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.pid = os.getpid()
+
+
+class ConnectionPool:
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._holders = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.connections_opened = 0
+
+    def _open(self):
+        # Each connection is only used by its own thread; check_same_thread is off so close_all() can close them
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        for pragma in PRAGMAS:
+            try:
+                conn.execute(pragma)
+            except sqlite3.DatabaseError as e:
+                # e.g. WAL is unavailable on some network filesystems
+                print(f"Warning: Could not apply '{pragma}': {e}")
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def connection(self):
+        """The calling thread's connection, opened on first use"""
+        holder = getattr(self._local, 'holder', None)
+        # A connection inherited through fork() must not be used by the child
+        if holder is None or holder.pid != os.getpid():
+            holder = _ThreadConnection(self._open())
+            self._local.holder = holder
+            with self._lock:
+                self._holders.add(holder)
+        elif holder.conn.in_transaction:
+            # A previous call raised before committing; don't let its writes leak into this one
+            holder.conn.rollback()
+        return holder.conn
+
+    def ensure_schema(self, init_fn):
+        """Run init_fn once for this database file in this process"""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            init_fn()
+            self._schema_ready = True
+
+    def close_all(self):
+        """Close every connection the pool handed out (e.g. before fork or at exit)"""
+        with self._lock:
+            holders = list(self._holders)
+            self._holders = weakref.WeakSet()
+        for holder in holders:
+            try:
+                holder.conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'db_path': self.db_path,
+                'open_connections': len(self._holders),
+                'connections_opened': self.connections_opened,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path):
+    """Process-wide pool for a database file"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path)
+        return pool
@@ -0,0 +1,160 @@
+"""
+On-disk cache of frozen-backbone embeddings
+
+Retraining only fits the dense head on top of a frozen ImageNet backbone, so
+the backbone output for an image never changes. This cache stores those
+pooled embeddings once, keyed by a hash of the image file contents, in a
+compact float16 array so retraining can fit the head on cached vectors and
+only new uploads go through the backbone.
+
+Layout (one directory per backbone):
+    <cache_dir>/<backbone>/embeddings.npy              float16, shape (N, D)
+    <cache_dir>/<backbone>/index.json                  {image_hash: row}
+    <cache_dir>/<backbone>/shards/<first row>.npy      rows added since, one file per add()
+    <cache_dir>/<backbone>/shards/<first row>.json     [image_hash, ...] for those rows
+
+add() only writes a shard with the new rows, so filling the cache chunk by
+chunk costs I/O proportional to the new data; loading folds the shards back
+into embeddings.npy/index.json.
+"""
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def image_hash(image_path, chunk_size=1 << 20):
+    """SHA-1 of an image file's bytes, or None if it cannot be read"""
+    digest = hashlib.sha1()
+    try:
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _save_array(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _save_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir='models/embedding_cache', backbone_name='EfficientNetB0'):
+        self.directory = os.path.join(cache_dir, backbone_name)
+        self.embeddings_path = os.path.join(self.directory, 'embeddings.npy')
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.shards_dir = os.path.join(self.directory, 'shards')
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.embeddings_path) and os.path.exists(self.index_path):
+            embeddings = np.load(self.embeddings_path)
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+            # Guard against an index written without its array (or vice versa)
+            if len(self.index) != len(embeddings):
+                print("Warning: Embedding cache index does not match its array, rebuilding")
+                embeddings, self.index = None, {}
+        else:
+            embeddings, self.index = None, {}
+        self._chunks = [] if embeddings is None else [embeddings]
+        self._embeddings = embeddings
+
+        shard_paths = sorted(glob.glob(os.path.join(self.shards_dir, '*.json')))
+        for shard_path in shard_paths:
+            if not self._load_shard(shard_path):
+                break
+        if shard_paths:
+            self._compact(shard_paths)
+
+    def _load_shard(self, shard_path):
+        """Append one shard's rows; False if it does not continue the rows loaded so far"""
+        try:
+            first_row = int(os.path.splitext(os.path.basename(shard_path))[0])
+            with open(shard_path) as f:
+                hashes = json.load(f)
+            rows = np.load(os.path.splitext(shard_path)[0] + '.npy')
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping unreadable embedding cache shard {shard_path}: {str(e)}")
+            return False
+        if first_row != len(self.index) or len(hashes) != len(rows):
+            print(f"Warning: Embedding cache shard {shard_path} does not line up with the cache, dropping it")
+            return False
+        for offset, h in enumerate(hashes):
+            self.index[h] = first_row + offset
+        self._chunks.append(rows)
+        self._embeddings = None
+        return True
+
+    def _compact(self, shard_paths):
+        """Fold the loaded shards into embeddings.npy/index.json and delete them"""
+        os.makedirs(self.directory, exist_ok=True)
+        if self.embeddings is not None:
+            _save_array(self.embeddings_path, self.embeddings)
+            _save_json(self.index_path, self.index)
+        for shard_path in shard_paths:
+            for path in (shard_path, os.path.splitext(shard_path)[0] + '.npy'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @property
+    def embeddings(self):
+        """All cached rows as one float16 array (None when empty); concatenated lazily after adds"""
+        if self._embeddings is None and self._chunks:
+            self._chunks = [np.concatenate(self._chunks)] if len(self._chunks) > 1 else self._chunks
+            self._embeddings = self._chunks[0]
+        return self._embeddings
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def missing(self, hashes):
+        """Hashes that still need to go through the backbone, in first-seen order"""
+        return list(dict.fromkeys(h for h in hashes if h not in self.index))
+
+    def get(self, hashes):
+        """Stack cached embeddings (as float32) for the given hashes"""
+        rows = [self.index[h] for h in hashes]
+        with self._lock:
+            embeddings = self.embeddings
+        return embeddings[rows].astype(np.float32)
+
+    def add(self, hashes, embeddings):
+        """Append new embeddings and persist just those rows as a new shard"""
+        embeddings = np.asarray(embeddings, dtype=np.float16)
+        with self._lock:
+            new = dict((h, e) for h, e in zip(hashes, embeddings) if h not in self.index)
+            if not new:
+                return 0
+
+            start = len(self.index)
+            new_rows = np.stack(list(new.values()))
+            os.makedirs(self.shards_dir, exist_ok=True)
+            shard_base = os.path.join(self.shards_dir, f'{start:010d}')
+            # The .json is written last: a shard without it is ignored on load
+            _save_array(shard_base + '.npy', new_rows)
+            _save_json(shard_base + '.json', list(new))
+
+            for offset, h in enumerate(new):
+                self.index[h] = start + offset
+            self._chunks.append(new_rows)
+            self._embeddings = None
+            return len(new)
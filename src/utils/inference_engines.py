@@ -0,0 +1,284 @@
+"""
+Pluggable inference engines for FurniturePredictor
+
+An engine takes a preprocessed float32 batch of shape (N, H, W, 3) and
+returns an (N, num_classes) array of class probabilities. The predictor only
+talks to this interface, so the Keras model and the TFLite interpreter are
+interchangeable.
+"""
+import threading
+import time
+
+import numpy as np
+
+
+class InferenceEngine:
+    name = 'base'
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+    def warm_up(self, batch):
+        """Run one throwaway batch so first-call costs are paid before real traffic"""
+        self.predict(batch)
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return {'backend': self.name}
+
+
+class KerasEngine(InferenceEngine):
+    """Runs a Keras model, or any object exposing predict(x, verbose=0)
+
+    With call_strategy='function' (the default) Keras models are called through
+    a tf.function with a fixed (None, H, W, C) float32 input signature: it is
+    traced once, on the first call, and reused for every batch size. 'predict'
+    goes through model.predict(), which builds a data adapter and callback list
+    on every call; it is kept for comparison and as a fallback.
+    """
+    name = 'keras'
+    CALL_STRATEGIES = ('function', 'predict')
+
+    def __init__(self, model, call_strategy='function'):
+        if call_strategy not in self.CALL_STRATEGIES:
+            raise ValueError(f"Unknown call strategy '{call_strategy}', expected one of {self.CALL_STRATEGIES}")
+        self.model = model
+        self._function = None
+
+        import tensorflow as tf
+        if call_strategy == 'function' and isinstance(model, tf.keras.Model) and model.inputs:
+            signature = tf.TensorSpec(shape=(None,) + tuple(model.inputs[0].shape[1:]), dtype=tf.float32)
+            self._function = tf.function(lambda x: model(x, training=False), input_signature=[signature])
+        self.call_strategy = 'function' if self._function is not None else 'predict'
+
+    def predict(self, batch):
+        if self._function is None:
+            return self.model.predict(batch, verbose=0)
+        return self._function(np.asarray(batch, dtype=np.float32)).numpy()
+
+    def describe(self):
+        return {'backend': self.name, 'call_strategy': self.call_strategy}
+
+
+class SavedModelSignatureEngine(InferenceEngine):
+    """Calls the serving signature of a TensorFlow SavedModel directly
+
+    The signature is a concrete function that was traced when the SavedModel
+    was written, so there is no Keras call path and no tracing at load time.
+    """
+    name = 'keras'
+    call_strategy = 'serving_signature'
+
+    def __init__(self, savedmodel_path, signature_key='serving_default'):
+        import tensorflow as tf
+
+        self.savedmodel_path = savedmodel_path
+        self._loaded = tf.saved_model.load(savedmodel_path)
+        self._signature = self._loaded.signatures[signature_key]
+        _, input_specs = self._signature.structured_input_signature
+        self._input_name = next(iter(input_specs))
+        self._output_name = next(iter(self._signature.structured_outputs))
+        self._constant = tf.constant
+
+    def predict(self, batch):
+        inputs = self._constant(np.asarray(batch, dtype=np.float32))
+        return self._signature(**{self._input_name: inputs})[self._output_name].numpy()
+
+    def describe(self):
+        return {'backend': self.name, 'call_strategy': self.call_strategy, 'model_path': self.savedmodel_path}
+
+
+class TFLiteEngine(InferenceEngine):
+    """Runs a .tflite model with the TensorFlow Lite interpreter
+
+    The interpreter is not thread-safe, so calls are serialized; the input
+    tensor is resized whenever the batch size changes.
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        # The standalone tflite-runtime package starts far faster than full TensorFlow
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        shape = list(self._input['shape'])
+        shape[0] = batch_size
+        self.interpreter.resize_tensor_input(self._input['index'], shape)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def _quantize_input(self, batch):
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize_output(self, output):
+        if self._output['dtype'] == np.float32:
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch):
+        batch = np.asarray(batch)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._resize(len(batch))
+            self.interpreter.set_tensor(self._input['index'], self._quantize_input(batch))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+        return self._dequantize_output(output)
+
+    def describe(self):
+        return {
+            'backend': self.name,
+            'model_path': self.model_path,
+            'input_dtype': np.dtype(self._input['dtype']).name,
+        }
+
+
+class CascadeEngine(InferenceEngine):
+    """Two-stage cascade: a small fast model answers first and only images it is
+    unsure about (top-1 probability below ``threshold``) are re-run on the full model
+    """
+    name = 'cascade'
+
+    def __init__(self, fast_engine, full_engine, threshold=0.9):
+        self.fast_engine = fast_engine
+        self.full_engine = full_engine
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.images_total = 0
+        self.fast_accepted = 0
+        self.escalated = 0
+        self.full_batches = 0
+
+    def predict(self, batch):
+        batch = np.asarray(batch)
+        predictions = np.array(self.fast_engine.predict(batch), dtype=np.float32)
+        escalate = np.flatnonzero(predictions.max(axis=1) < self.threshold)
+        if len(escalate):
+            predictions[escalate] = self.full_engine.predict(batch[escalate])
+
+        with self._lock:
+            self.images_total += len(batch)
+            self.fast_accepted += len(batch) - len(escalate)
+            self.escalated += len(escalate)
+            self.full_batches += 1 if len(escalate) else 0
+        return predictions
+
+    def warm_up(self, batch):
+        # The full model only sees escalated images, so warm both stages explicitly
+        self.fast_engine.warm_up(batch)
+        self.full_engine.warm_up(batch)
+
+    def close(self):
+        self.fast_engine.close()
+        self.full_engine.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'images_total': self.images_total,
+                'fast_accepted': self.fast_accepted,
+                'escalated': self.escalated,
+                'escalation_rate': (self.escalated / self.images_total) if self.images_total else 0.0,
+                'full_model_batches': self.full_batches,
+            }
+
+    def describe(self):
+        return {
+            'backend': self.name,
+            'fast': self.fast_engine.describe(),
+            'full': self.full_engine.describe(),
+            'threshold': self.threshold,
+        }
+
+
+class RemoteEngine(InferenceEngine):
+    """Forwards batches to the model-owning process of src/utils/inference_server.py
+
+    Lets several API worker processes share one loaded model without importing
+    TensorFlow themselves. Each calling thread keeps its own connection to the
+    server; a dropped connection is reopened once before the call fails.
+    """
+    name = 'remote'
+
+    def __init__(self, address, authkey, connect_timeout=600):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+        # The server only listens once its model is loaded and warmed up
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                info = self._call('info')
+                break
+            except (OSError, EOFError):
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Inference server at {address} did not come up "
+                                          f"within {connect_timeout}s")
+                time.sleep(0.5)
+        self.model_version = info['model_version']
+        self.class_labels = info['class_labels']
+        self.server_backend = info['backend']
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            from multiprocessing.connection import Client
+            conn = self._local.conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        return conn
+
+    def _call(self, op, payload=None):
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                status, value = conn.recv()
+                break
+            except (OSError, EOFError):
+                conn = getattr(self._local, 'conn', None)
+                self._local.conn = None
+                if conn is not None:
+                    conn.close()
+                if attempt == 2:
+                    raise
+        if status != 'ok':
+            raise RuntimeError(f"Inference server error: {value}")
+        return value
+
+    def predict(self, batch):
+        return self._call('predict', np.asarray(batch, dtype=np.float32))
+
+    def stats(self):
+        """Cascade counters of the server's model, or None"""
+        return self._call('cascade_stats')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def describe(self):
+        return {'backend': self.name, 'address': self.address, 'server_backend': self.server_backend}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Model-owning inference process for multi-worker serving
+
+One process loads the model (and the TensorFlow runtime) once; API worker
+processes decode and preprocess images themselves and send the float32
+batches here over a Unix socket (RemoteEngine in
+src/utils/inference_engines.py). Memory for the model and runtime is paid
+once however many workers there are, and single-image requests from every
+worker meet in one micro-batcher, so the forward passes stay batched.
+
+scripts/serve_api.py forks this process next to its HTTP workers. To run it
+on its own, give it an address and a shared key:
+
+Usage:
+    INFERENCE_SERVER_AUTHKEY=<hex> python -m src.utils.inference_server --address /tmp/furniture.sock
+"""
+import argparse
+import os
+import sys
+import threading
+import traceback
+
+from src.utils.predictor import FurniturePredictor
+
+
+def server_predictor(model_path=None, label_encoder_path=None):
+    """The predictor the server owns, configured from the same environment variables as scripts/simple_api.py"""
+    micro_batch_size = int(os.environ.get('API_MICRO_BATCH_SIZE', 16))
+    chunk_size = int(os.environ.get('API_BATCH_CHUNK_SIZE', 64))
+    return FurniturePredictor(
+        model_path, label_encoder_path,
+        use_batching=True,
+        max_batch_size=micro_batch_size,
+        warmup_batch_sizes=(1, micro_batch_size, chunk_size),
+        backend=os.environ.get('INFERENCE_BACKEND', 'keras'),
+        call_strategy=os.environ.get('INFERENCE_CALL_STRATEGY', 'function'),
+        quantization=os.environ.get('TFLITE_QUANTIZATION', 'float16'),
+        cascade_model_path=os.environ.get('CASCADE_MODEL_PATH') or None,
+        cascade_threshold=float(os.environ.get('CASCADE_THRESHOLD', 0.9)),
+        num_threads=int(os.environ['INFERENCE_NUM_THREADS']) if os.environ.get('INFERENCE_NUM_THREADS') else None
+    )
+
+
+def _handle(predictor, op, payload):
+    if op == 'predict':
+        # Single images go through the micro-batcher so concurrent workers share forward passes
+        if len(payload) == 1:
+            return predictor._infer_single(payload[0])[None, :]
+        return predictor._run_model(payload)
+    if op == 'info':
+        return {
+            'model_version': predictor.model_version,
+            'class_labels': predictor._class_labels(),
+            'backend': predictor.backend,
+        }
+    if op == 'cascade_stats':
+        return predictor.cascade_stats()
+    raise ValueError(f"Unknown operation '{op}'")
+
+
+def _serve_connection(predictor, conn):
+    """Answer one client's requests until it disconnects"""
+    with conn:
+        while True:
+            try:
+                op, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = ('ok', _handle(predictor, op, payload))
+            except Exception as e:
+                traceback.print_exc()
+                reply = ('error', str(e))
+            try:
+                conn.send(reply)
+            except OSError:
+                return
+
+
+def serve(predictor, address, authkey):
+    """Load the model, then accept worker connections on the Unix socket at address forever"""
+    from multiprocessing.connection import Listener
+
+    if not predictor.load_model():
+        raise RuntimeError("Inference server could not load the model")
+    # A socket file left behind by a crashed server would make bind() fail
+    if os.path.exists(address):
+        os.remove(address)
+    with Listener(address, family='AF_UNIX', authkey=authkey) as listener:
+        os.chmod(address, 0o600)
+        print(f"Inference server (pid {os.getpid()}) listening on {address}, model {predictor.model_version}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Includes clients that fail authentication
+                print(f"Warning: Rejected inference client: {str(e)}")
+                continue
+            threading.Thread(target=_serve_connection, args=(predictor, conn),
+                             name="inference-client", daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve forward passes of one loaded model over a Unix socket")
+    parser.add_argument('--address', required=True, help="Path of the Unix socket to listen on")
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--label-encoder-path', default=None)
+    args = parser.parse_args()
+
+    authkey = os.environ.get('INFERENCE_SERVER_AUTHKEY')
+    if not authkey:
+        print("Error: INFERENCE_SERVER_AUTHKEY must be set (hex string shared with the API workers)")
+        return False
+    serve(server_predictor(args.model_path, args.label_encoder_path), args.address, bytes.fromhex(authkey))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
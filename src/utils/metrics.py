@@ -0,0 +1,370 @@
+"""
+In-process metrics with Prometheus text exposition
+
+A small registry of counters, gauges and histograms covering each stage of a
+prediction (upload read, decode, preprocess, forward pass, label mapping and
+DB log), the batch sizes reaching the model, queue depths, the prediction
+cache hit ratio and the loaded model version. The API renders it at /metrics
+in the Prometheus text format; the Streamlit app reads the same registry in
+process through snapshot(). Quantiles in the snapshot are estimated from the
+histogram buckets the same way Prometheus' histogram_quantile() does.
+
+Metrics are per process: behind scripts/serve_api.py every worker keeps its
+own registry and answers /metrics for itself.
+"""
+import math
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Seconds; fine resolution below 100ms where decode/preprocess/forward live
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1,
+                   0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+STAGES = ('upload_read', 'decode', 'preprocess', 'forward', 'label_mapping', 'db_log')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """The child metric for one combination of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def clear(self):
+        """Drop every labelled child (e.g. the previous model version)"""
+        with self._lock:
+            self._children = {} if self.labelnames else {(): self._new_child()}
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in self._items():
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+    def set_function(self, function):
+        """Read the value from ``function()`` at collection time instead
+
+        Bound methods are held through a weak reference, so a gauge never keeps
+        their object (e.g. a predictor's batcher) alive; once it is gone the
+        gauge falls back to its plain value.
+        """
+        if hasattr(function, '__self__') and hasattr(function, '__func__'):
+            function = weakref.WeakMethod(function)
+        self._function = function
+
+    def clear_function(self, function):
+        """Stop reading from ``function`` unless another one has replaced it since"""
+        current = self._function
+        if isinstance(current, weakref.WeakMethod):
+            current = current()
+        if current is None or current == function:
+            self._function = None
+            with self._lock:
+                self._value = 0.0
+
+    def get(self):
+        function = self._function
+        if isinstance(function, weakref.WeakMethod):
+            function = function()
+        if function is not None:
+            try:
+                return float(function())
+            except Exception:
+                return math.nan
+        with self._lock:
+            return self._value
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.get())}"]
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+    def get(self):
+        return self.labels().get()
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"]
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the wall-clock duration of the with-block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def collect(self):
+        """(cumulative bucket counts incl. +Inf, sum)"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+    def quantile(self, q):
+        """Estimate the q-quantile by linear interpolation inside its bucket"""
+        cumulative, _ = self.collect()
+        count = cumulative[-1]
+        if count == 0:
+            return None
+        rank = q * count
+        lower_bound, lower_count = 0.0, 0
+        for bound, running in zip(self.buckets, cumulative):
+            if running >= rank:
+                in_bucket = running - lower_count
+                fraction = (rank - lower_count) / in_bucket if in_bucket else 0.0
+                return lower_bound + (bound - lower_bound) * fraction
+            lower_bound, lower_count = bound, running
+        # Beyond the largest finite bucket: report that bound, as Prometheus does
+        return self.buckets[-1]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, key, child):
+        cumulative, total = child.collect()
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])} {running}"
+            for bound, running in zip(self.buckets + (math.inf,), cumulative)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, or return the already registered one of the same name"""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Plain-Python view of the registry for in-process dashboards
+
+        Histograms report count, mean and estimated p50/p95/p99 per label set;
+        counters and gauges report their current value.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            rows = []
+            for key, child in metric._items():
+                row = dict(zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    cumulative, total = child.collect()
+                    count = cumulative[-1]
+                    row.update({
+                        'count': count,
+                        'mean': (total / count) if count else None,
+                        'p50': child.quantile(0.5),
+                        'p95': child.quantile(0.95),
+                        'p99': child.quantile(0.99),
+                    })
+                else:
+                    row['value'] = child.get()
+                rows.append(row)
+            snapshot[metric.name] = rows
+        return snapshot
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    """The process-wide registry holding the metrics below"""
+    return _registry
+
+
+STAGE_LATENCY = _registry.histogram(
+    'furniture_stage_latency_seconds',
+    'Time spent in each stage of a prediction',
+    labelnames=('stage',)
+)
+BATCH_SIZE = _registry.histogram(
+    'furniture_inference_batch_size',
+    'Number of images per forward pass',
+    buckets=BATCH_SIZE_BUCKETS
+)
+PREDICTIONS = _registry.counter(
+    'furniture_predictions',
+    'Images run through the model'
+)
+QUEUE_DEPTH = _registry.gauge(
+    'furniture_queue_depth',
+    'Items waiting in an internal queue',
+    labelnames=('queue',)
+)
+CACHE_HIT_RATIO = _registry.gauge(
+    'furniture_prediction_cache_hit_ratio',
+    'Share of prediction cache lookups served from the cache'
+)
+MODEL_INFO = _registry.gauge(
+    'furniture_model_info',
+    'Currently loaded model (always 1; the labels carry the information)',
+    labelnames=('version', 'backend')
+)
+
+# Pre-create every stage so /metrics lists them before the first request
+for _stage in STAGES:
+    STAGE_LATENCY.labels(stage=_stage)
+
+
+def stage_timer(stage):
+    """Context manager observing the duration of one prediction stage"""
+    return STAGE_LATENCY.labels(stage=stage).time()
+
+
+def set_model_info(version, backend):
+    """Point the model info gauge at the model that is now serving"""
+    MODEL_INFO.clear()
+    MODEL_INFO.labels(version=version, backend=backend).set(1)
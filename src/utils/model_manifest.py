@@ -0,0 +1,253 @@
+"""
+Model artifact manifests
+
+A manifest sits next to a model (models/<stem>.manifest.json) and records
+which artifact to load and how: its format (h5 or savedmodel), path, SHA-256
+checksum, class list and input shape. It is written when a model is trained,
+and on the first successful load of a model that has none, so
+FurniturePredictor can load the right artifact in one attempt instead of
+trying every format in turn.
+
+Hashing a large model on every start would cost more than it saves, so
+verified checksums are cached in .<stem>.verified.json, keyed on the
+artifact's size and modification time. `python -m src.utils.model_manifest
+verify` (run by start.sh before the app starts) only rehashes an artifact
+that changed, and never imports TensorFlow or loads the model.
+
+Usage:
+    python -m src.utils.model_manifest verify --model-path models/best_furniture_model.h5
+    python -m src.utils.model_manifest write --model-path models/best_furniture_model.h5 \
+        --artifact models/furniture_model_savedmodel
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from src.utils.model_registry import model_fingerprint
+
+MANIFEST_VERSION = 1
+FORMATS = ('h5', 'savedmodel')
+DEFAULT_INPUT_SHAPE = (224, 224, 3)
+
+
+def _split(model_path):
+    model_path = os.path.abspath(model_path.rstrip(os.sep))
+    return os.path.dirname(model_path), os.path.splitext(os.path.basename(model_path))[0]
+
+
+def manifest_path(model_path):
+    """e.g. models/best_furniture_model.h5 -> models/best_furniture_model.manifest.json"""
+    models_dir, stem = _split(model_path)
+    return os.path.join(models_dir, f'{stem}.manifest.json')
+
+
+def verified_cache_path(model_path):
+    models_dir, stem = _split(model_path)
+    return os.path.join(models_dir, f'.{stem}.verified.json')
+
+
+def detect_format(artifact_path):
+    return 'savedmodel' if os.path.isdir(artifact_path) else 'h5'
+
+
+def artifact_checksum(artifact_path):
+    """SHA-256 of a model file, or of every file (and its relative path) in a SavedModel directory"""
+    digest = hashlib.sha256()
+    if os.path.isdir(artifact_path):
+        files = []
+        for root, dirs, names in os.walk(artifact_path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+    else:
+        files = [artifact_path]
+
+    for path in files:
+        if os.path.isdir(artifact_path):
+            digest.update(os.path.relpath(path, artifact_path).encode() + b'\0')
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _remember_verified(model_path, artifact_path, checksum):
+    """Record that the artifact, as it is on disk now, has this checksum"""
+    try:
+        _write_json(verified_cache_path(model_path), {
+            'artifact_path': os.path.abspath(artifact_path),
+            'fingerprint': model_fingerprint(artifact_path),
+            'sha256': checksum,
+        })
+    except OSError as e:
+        print(f"Warning: Could not cache manifest verification: {e}")
+
+
+def _cached_checksum(model_path, artifact_path):
+    try:
+        with open(verified_cache_path(model_path)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('artifact_path') != os.path.abspath(artifact_path):
+        return None
+    if cached.get('fingerprint') != model_fingerprint(artifact_path):
+        return None
+    return cached.get('sha256')
+
+
+def write_manifest(model_path, artifact_path, class_names, input_shape=DEFAULT_INPUT_SHAPE,
+                   label_encoder_path=None, artifact_format=None):
+    """Hash the artifact and write the manifest for ``model_path``; returns the manifest dict"""
+    artifact_format = artifact_format or detect_format(artifact_path)
+    if artifact_format not in FORMATS:
+        raise ValueError(f"Unknown model format '{artifact_format}', expected one of {FORMATS}")
+
+    models_dir = os.path.dirname(manifest_path(model_path))
+    checksum = artifact_checksum(artifact_path)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'format': artifact_format,
+        'path': os.path.relpath(os.path.abspath(artifact_path), models_dir),
+        'sha256': checksum,
+        'label_encoder': (os.path.relpath(os.path.abspath(label_encoder_path), models_dir)
+                          if label_encoder_path else None),
+        'classes': [str(name) for name in class_names],
+        'input_shape': [int(dim) for dim in input_shape],
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+    _write_json(manifest_path(model_path), manifest)
+    _remember_verified(model_path, artifact_path, checksum)
+    return manifest
+
+
+def read_manifest(model_path):
+    """The manifest for ``model_path`` with absolute artifact_path/label_encoder_path added, or None"""
+    path = manifest_path(model_path)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Unreadable model manifest {path}: {e}")
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('format') not in FORMATS:
+        print(f"Warning: Unsupported model manifest {path}")
+        return None
+    models_dir = os.path.dirname(path)
+    manifest['artifact_path'] = os.path.normpath(os.path.join(models_dir, manifest['path']))
+    manifest['label_encoder_path'] = (os.path.normpath(os.path.join(models_dir, manifest['label_encoder']))
+                                      if manifest.get('label_encoder') else None)
+    return manifest
+
+
+def verify_manifest(model_path, manifest=None):
+    """Check the artifacts a manifest points to; returns (ok, message)
+
+    The checksum is only recomputed when the artifact changed since it was last verified.
+    """
+    manifest = manifest or read_manifest(model_path)
+    if manifest is None:
+        return False, f"no manifest at {manifest_path(model_path)}"
+    artifact_path = manifest['artifact_path']
+    if not os.path.exists(artifact_path):
+        return False, f"artifact {artifact_path} is missing"
+    if manifest['label_encoder_path'] and not os.path.exists(manifest['label_encoder_path']):
+        return False, f"label encoder {manifest['label_encoder_path']} is missing"
+
+    checksum = _cached_checksum(model_path, artifact_path)
+    if checksum is None:
+        checksum = artifact_checksum(artifact_path)
+        if checksum == manifest['sha256']:
+            _remember_verified(model_path, artifact_path, checksum)
+    if checksum != manifest['sha256']:
+        return False, f"checksum of {artifact_path} does not match the manifest"
+    return True, f"{manifest['format']} model {artifact_path} verified"
+
+
+def move_manifest(src_model_path, dst_model_path, dst_label_encoder_path=None):
+    """Re-point the manifest of a model that is about to be renamed to its final path"""
+    manifest = read_manifest(src_model_path)
+    if manifest is None:
+        return False
+    _write_json(manifest_path(dst_model_path), {
+        'version': manifest['version'],
+        'format': manifest['format'],
+        'path': os.path.basename(dst_model_path),
+        'sha256': manifest['sha256'],
+        'label_encoder': os.path.basename(dst_label_encoder_path) if dst_label_encoder_path else None,
+        'classes': manifest['classes'],
+        'input_shape': manifest['input_shape'],
+        'created_at': manifest['created_at'],
+    })
+    for path in (manifest_path(src_model_path), verified_cache_path(src_model_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    return True
+
+
+def _load_classes(label_encoder_path):
+    import pickle
+    with open(label_encoder_path, 'rb') as f:
+        return [str(name) for name in pickle.load(f).classes_]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or verify a model manifest")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify_parser = subparsers.add_parser('verify', help="Check the artifacts against the manifest (no model load)")
+    verify_parser.add_argument('--model-path', default='models/best_furniture_model.h5')
+
+    write_parser = subparsers.add_parser('write', help="Write the manifest for an existing model")
+    write_parser.add_argument('--model-path', default='models/best_furniture_model.h5')
+    write_parser.add_argument('--artifact', default=None, help="File or SavedModel to load (default: --model-path)")
+    write_parser.add_argument('--format', choices=FORMATS, default=None, help="Default: detected from --artifact")
+    write_parser.add_argument('--label-encoder-path', default='models/label_encoder.pkl')
+    write_parser.add_argument('--input-shape', type=int, nargs=3, default=list(DEFAULT_INPUT_SHAPE))
+    args = parser.parse_args()
+
+    if args.command == 'write':
+        manifest = write_manifest(
+            args.model_path,
+            args.artifact or args.model_path,
+            _load_classes(args.label_encoder_path),
+            input_shape=args.input_shape,
+            label_encoder_path=args.label_encoder_path,
+            artifact_format=args.format
+        )
+        print(f"Successfully wrote {manifest_path(args.model_path)} ({manifest['format']}, {manifest['sha256'][:12]})")
+        return True
+
+    manifest = read_manifest(args.model_path)
+    if manifest is None:
+        print(f"Warning: No manifest at {manifest_path(args.model_path)}; "
+              "the app will probe model formats on load and write one")
+        return True
+    ok, message = verify_manifest(args.model_path, manifest)
+    if not ok:
+        print(f"Error: Model manifest check failed: {message}")
+        return False
+    if manifest['label_encoder_path']:
+        classes = _load_classes(manifest['label_encoder_path'])
+        if classes != manifest['classes']:
+            print(f"Error: Label encoder classes {classes} do not match the manifest {manifest['classes']}")
+            return False
+    print(f"Successfully {message}; classes {manifest['classes']}, input shape {manifest['input_shape']}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,207 @@
+"""
+Process-wide registry of loaded models
+
+Streamlit runs every browser session in the same Python process, so instead
+of each session building and loading its own FurniturePredictor, sessions
+acquire a shared one from this registry. Entries are keyed by the resolved
+model paths plus a fingerprint of the artifact files, so a retrained model
+written to the same path is picked up as a new entry.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+
+
+def model_fingerprint(*paths):
+    """Cheap fingerprint of model artifacts based on path, size and modification time"""
+    digest = hashlib.sha1()
+    for path in paths:
+        if path is None or not os.path.exists(path):
+            digest.update(f"{path}:missing;".encode())
+            continue
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    stat = os.stat(file_path)
+                    digest.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        else:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def predictor_artifacts(model_path, label_encoder_path):
+    """Files FurniturePredictor.load_model may read for the given paths
+
+    The model manifest is left out on purpose: load_model writes one for a model
+    that has none, and that must not make the model look like a new one.
+    """
+    models_dir = os.path.dirname(model_path)
+    return [
+        os.path.join(models_dir, 'furniture_model_savedmodel'),
+        model_path,
+        label_encoder_path,
+    ]
+
+
+class _RegistryEntry:
+    def __init__(self, predictor, fingerprint):
+        self.predictor = predictor
+        self.fingerprint = fingerprint
+        self.refcount = 0
+        self.loaded_at = time.time()
+        self.last_acquired = self.loaded_at
+
+
+class ModelHandle:
+    """A session's reference to a shared predictor; released explicitly or when garbage collected"""
+
+    def __init__(self, registry, predictor):
+        self.predictor = predictor
+        self._finalizer = weakref.finalize(self, registry.release, predictor)
+
+    def release(self):
+        self._finalizer()
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._entries = {}
+
+    def _key(self, model_path, label_encoder_path, predictor_kwargs):
+        model_path = os.path.abspath(model_path)
+        label_encoder_path = os.path.abspath(label_encoder_path)
+        fingerprint = model_fingerprint(*predictor_artifacts(model_path, label_encoder_path))
+        # Options such as the backend change what gets loaded, so they are part of the key
+        # Serialized, since values may be lists or dicts (e.g. warmup_batch_sizes)
+        options = json.dumps(predictor_kwargs, sort_keys=True, default=repr)
+        return (model_path, label_encoder_path, fingerprint, options)
+
+    def acquire(self, model_path=None, label_encoder_path=None, **predictor_kwargs):
+        """Return a loaded predictor shared by every caller, loading it on first use
+
+        Returns None if the model cannot be loaded; failed loads are not cached.
+        ``predictor_kwargs`` (backend, batching, ...) are passed to FurniturePredictor
+        and predictors built with different options are cached separately.
+        """
+        from src.utils.predictor import FurniturePredictor
+
+        model_path, label_encoder_path = FurniturePredictor.resolve_paths(model_path, label_encoder_path)
+        key = self._key(model_path, label_encoder_path, predictor_kwargs)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refcount += 1
+                entry.last_acquired = time.time()
+                return entry.predictor
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available; the
+        # per-key lock makes concurrent first requests share a single load.
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    entry.last_acquired = time.time()
+                    return entry.predictor
+
+            print(f"Model registry: loading {model_path}")
+            predictor = FurniturePredictor(
+                model_path=model_path,
+                label_encoder_path=label_encoder_path,
+                **predictor_kwargs
+            )
+            if not predictor.load_model():
+                print(f"Model registry: failed to load {model_path}")
+                predictor.close()
+                return None
+
+            # Store under the key later callers will compute; if loading wrote to
+            # one of the fingerprinted files, the pre-load key would never match again
+            loaded_key = self._key(model_path, label_encoder_path, predictor_kwargs)
+            if loaded_key != key:
+                print("Warning: Model registry: model artifacts changed while loading")
+            with self._lock:
+                entry = _RegistryEntry(predictor, loaded_key[2])
+                entry.refcount = 1
+                self._entries[loaded_key] = entry
+                self._load_locks.pop(key, None)
+            return predictor
+
+    def acquire_handle(self, model_path=None, label_encoder_path=None, **predictor_kwargs):
+        """Like acquire, but wraps the predictor in a ModelHandle that releases itself"""
+        predictor = self.acquire(model_path, label_encoder_path, **predictor_kwargs)
+        if predictor is None:
+            return None
+        return ModelHandle(self, predictor)
+
+    def release(self, predictor):
+        """Drop one reference to a predictor obtained from acquire"""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.predictor is predictor:
+                    entry.refcount = max(entry.refcount - 1, 0)
+                    return True
+        return False
+
+    def evict(self, model_path=None, force=False):
+        """Remove cached models, optionally only those loaded from ``model_path``
+
+        Entries still referenced by a session are kept unless ``force`` is set.
+        Returns the number of evicted models.
+        """
+        if model_path is not None:
+            model_path = os.path.abspath(model_path)
+
+        with self._lock:
+            evicted = [
+                key for key, entry in self._entries.items()
+                if (model_path is None or key[0] == model_path) and (force or entry.refcount == 0)
+            ]
+            entries = [self._entries.pop(key) for key in evicted]
+
+        for entry in entries:
+            entry.predictor.close()
+        if entries:
+            print(f"Model registry: evicted {len(entries)} model(s)")
+        return len(entries)
+
+    def evict_idle(self):
+        """Remove every model no session currently holds"""
+        return self.evict(force=False)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    'model_path': key[0],
+                    'label_encoder_path': key[1],
+                    'fingerprint': entry.fingerprint,
+                    'options': json.loads(key[3]),
+                    'refcount': entry.refcount,
+                    'loaded_at': entry.loaded_at,
+                    'last_acquired': entry.last_acquired,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    """Return the registry shared by the whole process"""
+    return _registry
@@ -1,516 +1,30 @@
-import numpy as np
-import pandas as pd
-import os
-from datetime import datetime
-import pickle
+"""
+Compatibility entry point for the trainer and predictor
 
-# Import TensorFlow and required modules
-try:
-    import tensorflow as tf
-    from tensorflow.keras.applications import EfficientNetB0, MobileNetV2
-    from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
-    from tensorflow.keras.models import Model
-    from tensorflow.keras.optimizers import Adam
-    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
-    from tensorflow.keras.preprocessing.image import load_img, img_to_array, ImageDataGenerator
-    from tensorflow.keras.utils import to_categorical
-    print("TensorFlow loaded successfully")
-    TENSORFLOW_AVAILABLE = True
-except ImportError as e:
-    print(f"TensorFlow not available: {e}")
-    TENSORFLOW_AVAILABLE = False
+FurnitureModelTrainer lives in src.utils.trainer and FurniturePredictor in
+src.utils.predictor. Both are resolved on first attribute access, so
+``from src.utils.model_utils import FurniturePredictor`` keeps working
+without importing the training stack.
+"""
+import importlib
 
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+_LAZY_ATTRIBUTES = {
+    'FurniturePredictor': 'src.utils.predictor',
+    'FurnitureModelTrainer': 'src.utils.trainer',
+    'TENSORFLOW_AVAILABLE': 'src.utils.predictor',
+}
 
-class FurnitureModelTrainer:
-    def __init__(self, img_size=224, batch_size=32, num_classes=5):
-        if not TENSORFLOW_AVAILABLE:
-            raise ImportError("TensorFlow is required for model training but is not available.")
-        
-        self.img_size = img_size
-        self.batch_size = batch_size
-        self.num_classes = num_classes
-        self.class_names = ['Almirah', 'Chair', 'Fridge', 'Table', 'TV']
-        
-    def create_model(self, input_shape=(224, 224, 3)):
-        """Create model with transfer learning"""
-        try:
-            print("Attempting to load EfficientNetB0...")
-            base_model = EfficientNetB0(
-                weights='imagenet',
-                include_top=False,
-                input_shape=input_shape
-            )
-            model_name = "EfficientNetB0"
-        except Exception as e:
-            print(f"EfficientNetB0 loading failed: {str(e)}")
-            print("Falling back to MobileNetV2...")
-            base_model = MobileNetV2(
-                weights='imagenet',
-                include_top=False,
-                input_shape=input_shape
-            )
-            model_name = "MobileNetV2"
-        
-        # Freeze base model initially
-        base_model.trainable = False
-    
-        inputs = base_model.input
-        x = base_model.output
-        x = GlobalAveragePooling2D()(x)
-        x = Dropout(0.3)(x)
-        x = Dense(256, activation='relu')(x)
-        x = Dropout(0.4)(x)
-        outputs = Dense(self.num_classes, activation='softmax')(x)
-        
-        model = Model(inputs, outputs)
-        return model, base_model, model_name
-    
-    def prepare_data_from_dataframe(self, df, validation_split=0.2):
-        """Prepare training data from DataFrame"""
-        from sklearn.model_selection import train_test_split
-        from sklearn.preprocessing import LabelEncoder
-        
-        # Print data info for debugging
-        print(f"Data shape: {df.shape}")
-        print(f"Unique classes: {df['class_name'].unique()}")
-        print(f"Class ID range: {df['class_id'].min()} to {df['class_id'].max()}")
-        
-        # Ensure class IDs are within expected range [0, 4]
-        valid_class_ids = set(range(self.num_classes))
-        df_filtered = df[df['class_id'].isin(valid_class_ids)].copy()
-        
-        if len(df_filtered) < len(df):
-            print(f"Warning: Filtered out {len(df) - len(df_filtered)} samples with invalid class IDs")
-        
-       
-        df_filtered['class_id_encoded'] = df_filtered['class_id']
-        
-        # Create a label encoder that maps to our expected class names
-        label_encoder = LabelEncoder()
-        label_encoder.fit(self.class_names) 
-        
-        # Check if we have enough samples for stratified split
-        class_counts = df_filtered['class_name'].value_counts()
-        min_samples_per_class = class_counts.min()
-        
-        if min_samples_per_class < 2 or len(df_filtered) < 10:
-            # If we have too few samples, don't use validation split
-            print(f"Warning: Insufficient data for validation split. Using all data for training.")
-            print(f"Minimum samples per class: {min_samples_per_class}")
-            
-            train_df = df_filtered.copy()
-            val_df = df_filtered.sample(min(len(df_filtered), 5), random_state=42) 
-            
-            y_train = to_categorical(train_df['class_id_encoded'], num_classes=self.num_classes)
-            y_val = to_categorical(val_df['class_id_encoded'], num_classes=self.num_classes)
-        else:
-            # Use stratified split only if we have enough samples
-            try:
-                train_df, val_df = train_test_split(
-                    df_filtered, test_size=validation_split, 
-                    stratify=df_filtered['class_name'], random_state=42
-                )
-            except ValueError:
-                # Fallback to random split if stratified fails
-                print("Stratified split failed, using random split...")
-                train_df, val_df = train_test_split(
-                    df_filtered, test_size=validation_split, random_state=42
-                )
-            
-            # Convert to one-hot encoding
-            y_train = to_categorical(train_df['class_id_encoded'], num_classes=self.num_classes)
-            y_val = to_categorical(val_df['class_id_encoded'], num_classes=self.num_classes)
-        
-        print(f"Final training samples: {len(train_df)}")
-        print(f"Final validation samples: {len(val_df)}")
-        print(f"Training labels shape: {y_train.shape}")
-        print(f"Validation labels shape: {y_val.shape}")
-        
-        return train_df, val_df, y_train, y_val, label_encoder
-    
-    def create_data_generator(self, df, labels, augment=False, shuffle=True):
-        """Create data generator from DataFrame"""
-        if augment:
-            datagen = ImageDataGenerator(
-                rotation_range=20,
-                width_shift_range=0.2,
-                height_shift_range=0.2,
-                horizontal_flip=True,
-                zoom_range=0.2,
-                fill_mode='nearest',
-                rescale=1./255
-            )
-        else:
-            datagen = ImageDataGenerator(rescale=1./255)
-        
-        def data_generator():
-            indices = np.arange(len(df))
-            while True:
-                if shuffle:
-                    np.random.shuffle(indices)
-                
-                for start_idx in range(0, len(indices), self.batch_size):
-                    batch_indices = indices[start_idx:start_idx + self.batch_size]
-                    batch_paths = df.iloc[batch_indices]['image_path'].values
-                    batch_labels = labels[batch_indices]
-                    
-                    batch_images = []
-                    valid_labels = []
-                    
-                    for i, path in enumerate(batch_paths):
-                        try:
-                            if os.path.exists(path) and i < len(batch_labels):
-                                img = load_img(path, target_size=(self.img_size, self.img_size))
-                                img_array = img_to_array(img)
-                                
-                                if augment:
-                                    img_array = datagen.random_transform(img_array)
-                                
-                                img_array = img_array / 255.0
-                                batch_images.append(img_array)
-                                valid_labels.append(batch_labels[i])
-                        except Exception as e:
-                            print(f"Error processing image {path}: {str(e)}")
-                            continue
-                    
-                    if len(batch_images) > 0:
-                        yield np.array(batch_images), np.array(valid_labels)
-        
-        return data_generator
-    
-    def train_model(self, combined_data, epochs=10, model_save_path='models/retrained_model.h5'):
-        """Train model on combined data"""
-        print("Preparing data for retraining...")
-        
-        # Prepare data
-        train_df, val_df, y_train, y_val, label_encoder = self.prepare_data_from_dataframe(combined_data)
-        
-        print(f"Training samples: {len(train_df)}")
-        print(f"Validation samples: {len(val_df)}")
-        
-        # Create generators
-        train_generator = self.create_data_generator(train_df, y_train, augment=True, shuffle=True)
-        val_generator = self.create_data_generator(val_df, y_val, augment=False, shuffle=False)
-        
-        # Calculate steps
-        steps_per_epoch = len(train_df) // self.batch_size
-        validation_steps = len(val_df) // self.batch_size
-        
-        if steps_per_epoch == 0:
-            steps_per_epoch = 1
-        if validation_steps == 0:
-            validation_steps = 1
-        
-        # Create model
-        model, base_model, model_name = self.create_model()
-        
-        # Compile model
-        model.compile(
-            optimizer=Adam(learning_rate=0.001),
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
-        
-        # Define callbacks
-        callbacks = [
-            EarlyStopping(
-                monitor='val_accuracy',
-                patience=5,
-                restore_best_weights=True,
-                verbose=1
-            ),
-            ModelCheckpoint(
-                model_save_path,
-                monitor='val_accuracy',
-                save_best_only=True,
-                verbose=1
-            ),
-            ReduceLROnPlateau(
-                monitor='val_loss',
-                factor=0.2,
-                patience=3,
-                min_lr=1e-7,
-                verbose=1
-            )
-        ]
-        
-        print("Starting model training...")
-        start_time = datetime.now()
-        
-        # Train model
-        history = model.fit(
-            train_generator(),
-            steps_per_epoch=steps_per_epoch,
-            epochs=epochs,
-            validation_data=val_generator(),
-            validation_steps=validation_steps,
-            callbacks=callbacks,
-            verbose=1
-        )
-        
-        end_time = datetime.now()
-        training_time = (end_time - start_time).total_seconds() / 60  
-        
-        # Get final accuracy
-        final_accuracy = max(history.history['val_accuracy'])
-        
-        # Save label encoder
-        encoder_path = model_save_path.replace('.h5', '_label_encoder.pkl')
-        with open(encoder_path, 'wb') as f:
-            pickle.dump(label_encoder, f)
-        
-        return {
-            'model': model,
-            'history': history,
-            'final_accuracy': final_accuracy,
-            'training_time': training_time,
-            'model_path': model_save_path,
-            'label_encoder': label_encoder,
-            'original_count': len(combined_data[combined_data['image_path'].str.contains('Furnitures')]),
-            'user_count': len(combined_data[~combined_data['image_path'].str.contains('Furnitures')])
-        }
+__all__ = list(_LAZY_ATTRIBUTES)
 
-class FurniturePredictor:
-    def __init__(self, model_path=None, label_encoder_path=None):
-        if not TENSORFLOW_AVAILABLE:
-            raise ImportError("TensorFlow is required for predictions but is not available.")
-        
-        # Use absolute paths based on current working directory
-        base_dir = os.getcwd()
-        
-        if model_path is None:
-            self.model_path = os.path.join(base_dir, 'models', 'best_furniture_model.h5')
-        else:
-            self.model_path = model_path
-            
-        if label_encoder_path is None:
-            self.label_encoder_path = os.path.join(base_dir, 'models', 'label_encoder.pkl')
-        else:
-            self.label_encoder_path = label_encoder_path
-            
-        self.model = None
-        self.label_encoder = None
-        self.class_names = ['Almirah', 'Chair', 'Fridge', 'Table', 'TV']
-        self.img_size = 224
-        
-        print(f"Model path: {self.model_path}")
-        print(f"Label encoder path: {self.label_encoder_path}")
-        print(f"Current working directory: {base_dir}")
-        print(f"Model file exists: {os.path.exists(self.model_path)}")
-        print(f"Label encoder file exists: {os.path.exists(self.label_encoder_path)}")
-        
-    def load_model(self):
-        """Load the trained model and label encoder"""
-        try:
-            # Debug: List all files in models directory
-            models_dir = os.path.dirname(self.model_path)
-            if os.path.exists(models_dir):
-                print(f"Files in {models_dir}:")
-                for file in os.listdir(models_dir):
-                    full_path = os.path.join(models_dir, file)
-                    if os.path.isfile(full_path):
-                        size = os.path.getsize(full_path)
-                        print(f"  {file} ({size:,} bytes)")
-                    else:
-                        print(f"  {file}/")
-            else:
-                print(f"Models directory does not exist: {models_dir}")
-            
-            print(f"Loading model from: {self.model_path}")
-            
-            # Try multiple loading strategies for compatibility
-            model_loaded = False
-            
-            # Strategy 1: Try SavedModel format first (most compatible)
-            savedmodel_path = os.path.join(os.path.dirname(self.model_path), 'furniture_model_savedmodel')
-            if os.path.exists(savedmodel_path):
-                try:
-                    print(f"� Trying SavedModel format: {savedmodel_path}")
-                    
-                    # For TensorFlow 2.15.0 compatibility, use tf.saved_model.load first
-                    try:
-                        # Try standard loading
-                        self.model = tf.keras.models.load_model(savedmodel_path)
-                        model_loaded = True
-                        print(f"Successfully SavedModel loaded successfully with standard method")
-                    except:
-                        # Try with tf.saved_model.load for older TF versions
-                        try:
-                            import tensorflow as tf
-                            loaded = tf.saved_model.load(savedmodel_path)
-                            
-                            # Create a wrapper function for inference
-                            def predict_function(x):
-                                return loaded.signatures['serving_default'](tf.convert_to_tensor(x))['output_0']
-                            
-                            # Create a minimal wrapper class
-                            class SavedModelWrapper:
-                                def __init__(self, predict_fn):
-                                    self._predict_fn = predict_fn
-                                
-                                def predict(self, x, verbose=0):
-                                    if len(x.shape) == 3:
-                                        x = np.expand_dims(x, axis=0)
-                                    return self._predict_fn(x.astype(np.float32)).numpy()
-                            
-                            self.model = SavedModelWrapper(predict_function)
-                            model_loaded = True
-                            print(f"Successfully SavedModel loaded with tf.saved_model.load wrapper")
-                        except Exception as e3:
-                            print(f"Warning: SavedModel tf.saved_model.load failed: {str(e3)}")
-                            
-                except Exception as e1:
-                    print(f"Warning: SavedModel loading failed: {str(e1)}")
-            
-            # Strategy 2: Standard H5 loading
-            if not model_loaded and os.path.exists(self.model_path):
-                try:
-                    self.model = tf.keras.models.load_model(self.model_path)
-                    model_loaded = True
-                    print(f"Successfully H5 model loaded successfully with standard method")
-                except Exception as e2:
-                    print(f"Warning: Standard H5 loading failed: {str(e2)}")
-                    
-                    # Strategy 3: H5 with compile=False
-                    try:
-                        self.model = tf.keras.models.load_model(self.model_path, compile=False)
-                        model_loaded = True
-                        print(f"Successfully H5 model loaded successfully with compile=False")
-                    except Exception as e3:
-                        print(f"Warning: H5 loading with compile=False failed: {str(e3)}")
-            
-            # Strategy 4: Try alternative H5 model
-            if not model_loaded:
-                alt_model_path = os.path.join(os.path.dirname(self.model_path), 'Training_0802_pax.h5')
-                if os.path.exists(alt_model_path):
-                    try:
-                        print(f"Trying Trying alternative H5 model: {alt_model_path}")
-                        self.model = tf.keras.models.load_model(alt_model_path)
-                        model_loaded = True
-                        print(f"Successfully Alternative H5 model loaded successfully")
-                        # Update label encoder path to match
-                        alt_le_path = os.path.join(os.path.dirname(self.label_encoder_path), 'Training_0802_pax_label_encoder.pkl')
-                        if os.path.exists(alt_le_path):
-                            self.label_encoder_path = alt_le_path
-                            print(f"Successfully Updated label encoder path to: {alt_le_path}")
-                    except Exception as e4:
-                        print(f"Warning: Alternative H5 model loading failed: {str(e4)}")
-            
-            if not model_loaded:
-                print(f"Error: All model loading strategies failed")
-                return False
-            
-            # Try to load label encoder with fallback
-            self.label_encoder = None
-            if os.path.exists(self.label_encoder_path):
-                try:
-                    with open(self.label_encoder_path, 'rb') as f:
-                        self.label_encoder = pickle.load(f)
-                    print(f"Successfully Label encoder loaded from {self.label_encoder_path}")
-                    print(f"Label encoder classes: {list(self.label_encoder.classes_)}")
-                    
-                    # Verify the label encoder has the expected classes
-                    expected_classes = set(self.class_names)
-                    actual_classes = set(str(cls) for cls in self.label_encoder.classes_)
-                    
-                    if expected_classes != actual_classes:
-                        print(f"Warning: Label encoder class mismatch!")
-                        print(f"Expected: {self.class_names}")
-                        print(f"Actual: {list(self.label_encoder.classes_)}")
-                        print("Creating fallback encoder...")
-                        self.label_encoder = self._create_fallback_encoder()
-                        
-                except Exception as le_error:
-                    print(f"Warning: Error loading label encoder: {str(le_error)}")
-                    print("Creating fallback encoder...")
-                    self.label_encoder = self._create_fallback_encoder()
-            else:
-                print(f"Label encoder not found at {self.label_encoder_path}")
-                print("Creating fallback encoder...")
-                self.label_encoder = self._create_fallback_encoder()
-                
-        except Exception as e:
-            print(f"Error loading model: {str(e)}")
-            return False
-        return True
-    
-    def _create_fallback_encoder(self):
-        """Create a fallback label encoder with correct class order"""
-        from sklearn.preprocessing import LabelEncoder
-        import numpy as np
-        
-        fallback_encoder = LabelEncoder()
-        # Manually set the classes in the correct order
-        fallback_encoder.classes_ = np.array(self.class_names, dtype=object)
-        print(f"Successfully Fallback encoder created with classes: {self.class_names}")
-        return fallback_encoder
-    
-    def predict_image(self, image_path):
-        """Make prediction on a single image"""
-        if self.model is None:
-            if not self.load_model():
-                print("Error: Failed to load model")
-                return None
-        
-        try:
-            # Load and preprocess image
-            print(f"Loading Loading image: {image_path}")
-            img = load_img(image_path, target_size=(self.img_size, self.img_size))
-            img_array = img_to_array(img)
-            img_array = np.expand_dims(img_array, axis=0)
-            img_array = img_array / 255.0
-            
-            print(f" Making prediction...")
-            
-            # Make prediction with regular Keras model
-            predictions = self.model.predict(img_array, verbose=0)
-            
-            confidence = np.max(predictions[0])
-            predicted_class_idx = np.argmax(predictions[0])
-            
-            print(f"Prediction Raw prediction index: {predicted_class_idx}")
-            print(f"Prediction Confidence: {confidence:.3f}")
-            
-            # Get class name with robust error handling
-            try:
-                if self.label_encoder is not None:
-                    if hasattr(self.label_encoder, 'classes_') and len(self.label_encoder.classes_) > predicted_class_idx:
-                        predicted_class = str(self.label_encoder.classes_[predicted_class_idx])
-                        print(f"Successfully Using label encoder: {predicted_class}")
-                    else:
-                        print("Warning: Label encoder classes_ issue, using default")
-                        predicted_class = self.class_names[predicted_class_idx] if predicted_class_idx < len(self.class_names) else "Unknown"
-                else:
-                    print("Warning: No label encoder, using default class names")
-                    predicted_class = self.class_names[predicted_class_idx] if predicted_class_idx < len(self.class_names) else "Unknown"
-            except Exception as class_error:
-                print(f"Error: Error getting class name: {str(class_error)}")
-                predicted_class = self.class_names[predicted_class_idx] if predicted_class_idx < len(self.class_names) else "Unknown"
-            
-            result = {
-                'predicted_class': predicted_class,
-                'confidence': float(confidence),
-                'all_predictions': predictions[0].tolist(),
-                'class_names': self.class_names
-            }
-            
-            print(f"✅ Prediction successful: {predicted_class} ({confidence:.3f})")
-            return result
-            
-        except Exception as e:
-            print(f"Error: Error making prediction: {str(e)}")
-            import traceback
-            print("Full traceback:")
-            traceback.print_exc()
-            return None
-    
-    def predict_batch(self, image_paths):
-        """Make predictions on multiple images"""
-        results = []
-        for image_path in image_paths:
-            result = self.predict_image(image_path)
-            if result:
-                result['image_path'] = image_path
-                results.append(result)
-        return results
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,155 @@
+"""
+Content-addressed cache for prediction results
+
+Results are keyed by a SHA-256 of the raw upload bytes plus the version of
+the model that produced them, so a retrained model never serves stale
+answers. The in-memory tier is a bounded LRU with a TTL; an optional disk
+tier keeps results across restarts.
+"""
+import copy
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from src.utils.metrics import CACHE_HIT_RATIO
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(image_bytes, model_version):
+        """Cache key for an upload: content hash plus model version"""
+        return f"{model_version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def _disk_path(self, key):
+        model_version, content_hash = key.split(':', 1)
+        return os.path.join(self.disk_dir, model_version, content_hash[:2], f"{content_hash}.json")
+
+    def _expired(self, stored_at):
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """Return a copy of the cached result, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return copy.deepcopy(result)
+                del self._entries[key]
+
+        result = self._disk_get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_put(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        """Store a prediction result (a JSON-serializable dict)"""
+        result = copy.deepcopy(result)
+        self._memory_put(key, result)
+        self._disk_put(key, result)
+
+    def _memory_put(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write prediction cache entry: {e}")
+
+    def invalidate(self, model_version=None):
+        """Drop cached results, either all of them or only those of one model version"""
+        with self._lock:
+            if model_version is None:
+                self._entries.clear()
+            else:
+                prefix = f"{model_version}:"
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[key]
+
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            targets = [model_version] if model_version is not None else os.listdir(self.disk_dir)
+            for name in targets:
+                shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Process-wide cache, configured from PREDICTION_CACHE_SIZE/_TTL/_DIR"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache(
+                max_entries=int(os.environ.get('PREDICTION_CACHE_SIZE', 1024)),
+                ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)),
+                disk_dir=os.environ.get('PREDICTION_CACHE_DIR') or None
+            )
+            CACHE_HIT_RATIO.set_function(lambda: _cache.stats()['hit_ratio'])
+        return _cache
@@ -0,0 +1,153 @@
+"""
+Asynchronous, batched prediction logging
+
+Writing each prediction with its own INSERT and COMMIT puts an fsync on the
+request path. PredictionLogWriter instead takes records into a bounded
+in-memory queue and a background thread writes them with executemany, one
+transaction per ``batch_size`` records or ``flush_interval`` seconds,
+whichever comes first. When the queue is full new records are dropped (and
+counted) rather than blocking the caller. Pending records are flushed on
+stop() and at interpreter exit.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from src.utils.metrics import QUEUE_DEPTH, stage_timer
+
+
+class PredictionLogWriter:
+    def __init__(self, db, max_queue=10000, batch_size=500, flush_interval=0.5, name="prediction-log-writer"):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.logged = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def start(self):
+        """Start the background writer thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Write everything still queued, then stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop_event.set()
+        try:
+            self._queue.put_nowait(None)  # wake the writer if it is waiting
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def log(self, image_path, predicted_class, confidence, true_class=None, model_version='v1.0'):
+        """Queue one prediction; never blocks. Returns False if the record was dropped"""
+        if not self.running:
+            self.start()
+        # Stamp the time now: the row is written up to flush_interval later
+        record = (image_path, true_class, predicted_class, float(confidence), model_version,
+                  time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queue_depth(),
+                'max_queue': self._queue.maxsize,
+                'logged': self.logged,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'flushes': self.flushes,
+            }
+
+    def _collect_batch(self):
+        """Wait for the first record, then gather more until the batch is full or the window closes"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [] if first is None else [first]
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        return batch
+
+    def _write(self, batch):
+        try:
+            with stage_timer('db_log'):
+                self.db.log_predictions(batch)
+        except Exception as e:
+            print(f"Warning: Failed to write {len(batch)} prediction log records: {e}")
+            with self._lock:
+                self.failed += len(batch)
+            return
+        with self._lock:
+            self.logged += len(batch)
+            self.flushes += 1
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+            if self._stop_event.is_set() and self._queue.empty():
+                break
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_prediction_log_writer(db):
+    """Process-wide writer, configured from PREDICTION_LOG_QUEUE_SIZE/_BATCH_SIZE/_FLUSH_INTERVAL"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = PredictionLogWriter(
+                db,
+                max_queue=int(os.environ.get('PREDICTION_LOG_QUEUE_SIZE', 10000)),
+                batch_size=int(os.environ.get('PREDICTION_LOG_BATCH_SIZE', 500)),
+                flush_interval=float(os.environ.get('PREDICTION_LOG_FLUSH_INTERVAL', 0.5))
+            )
+            _writer.start()
+            QUEUE_DEPTH.labels(queue='prediction_log').set_function(_writer.queue_depth)
+            atexit.register(_writer.stop)
+        return _writer
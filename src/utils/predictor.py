@@ -0,0 +1,795 @@
+"""
+Model serving: FurniturePredictor
+
+TensorFlow is imported on first model load rather than at import time, and
+only the parts inference needs: the TFLite backend never touches Keras, and
+importing this module (e.g. for a health check) costs next to nothing.
+"""
+import importlib.util
+import numpy as np
+import os
+import threading
+import time
+from datetime import datetime
+import pickle
+import io
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from src.utils.batching import MicroBatcher
+from src.utils.inference_engines import (
+    CascadeEngine, KerasEngine, RemoteEngine, SavedModelSignatureEngine, TFLiteEngine
+)
+from src.utils.metrics import BATCH_SIZE, PREDICTIONS, QUEUE_DEPTH, set_model_info, stage_timer
+from src.utils.model_manifest import read_manifest, verify_manifest, write_manifest
+from src.utils.model_registry import model_fingerprint, predictor_artifacts
+from src.utils.tflite_export import (
+    default_source_path, export_tflite, read_export_stamp, source_stamp, tflite_model_path, write_export_stamp
+)
+
+# Checked without importing TensorFlow; the import happens in load_model
+TENSORFLOW_AVAILABLE = importlib.util.find_spec('tensorflow') is not None
+
+
+class FurniturePredictor:
+    # 'remote' sends batches to the process running src/utils/inference_server.py, which
+    # owns the model; this process then never imports TensorFlow
+    BACKENDS = ('keras', 'tflite', 'remote')
+    # How the Keras backend calls the model: a compiled tf.function, Keras predict(),
+    # or the serving signature of a SavedModel export
+    CALL_STRATEGIES = ('function', 'predict', 'serving_signature')
+    
+    def __init__(self, model_path=None, label_encoder_path=None,
+                 use_batching=False, max_batch_size=16, max_wait_ms=10,
+                 backend='keras', quantization='float16', num_threads=None,
+                 cache=None, cascade_model_path=None, cascade_threshold=0.9,
+                 warmup_batch_sizes=None, call_strategy='function',
+                 server_address=None, server_authkey=None):
+        if backend != 'remote' and not TENSORFLOW_AVAILABLE:
+            raise ImportError("TensorFlow is required for predictions but is not available.")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {self.BACKENDS}")
+        if call_strategy not in self.CALL_STRATEGIES:
+            raise ValueError(f"Unknown call strategy '{call_strategy}', expected one of {self.CALL_STRATEGIES}")
+        
+        base_dir = os.getcwd()
+        self.model_path, self.label_encoder_path = self.resolve_paths(model_path, label_encoder_path)
+            
+        # Inference backend: the Keras model, or a quantized TFLite export of it
+        self.backend = backend
+        self.quantization = quantization
+        self.num_threads = num_threads
+        self.call_strategy = call_strategy
+        self.server_address = server_address
+        self.server_authkey = server_authkey
+        self.engine = None
+        
+        # Optional two-stage cascade: a fast model answers confident cases on its own
+        self.cascade_model_path = cascade_model_path
+        self.cascade_threshold = cascade_threshold
+        
+        # Optional PredictionCache consulted by predict_bytes; keyed on model_version
+        self.cache = cache
+        self.model_version = None
+        
+        self.model = None
+        self.manifest = None
+        self._probed_artifact = None
+        self.label_encoder = None
+        # Class names by output column when they come from the inference server instead
+        self.labels = None
+        self.class_names = ['Almirah', 'Chair', 'Fridge', 'Table', 'TV']
+        self.img_size = 224
+        
+        # Optional micro-batching: concurrent predict_image calls share one forward pass
+        self.batcher = None
+        if use_batching:
+            self.batcher = MicroBatcher(
+                self._run_model,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                name="furniture-predictor-batcher"
+            )
+            QUEUE_DEPTH.labels(queue='micro_batcher').set_function(self.batcher.queue_depth)
+        
+        # Batch sizes run once after loading, so tracing and kernel selection happen before
+        # real traffic; defaults to single images plus full micro-batches. () disables it.
+        if warmup_batch_sizes is None:
+            warmup_batch_sizes = (1, max_batch_size) if use_batching else (1,)
+        self.warmup_batch_sizes = tuple(sorted(set(int(size) for size in warmup_batch_sizes)))
+        self._ready = threading.Event()
+        
+        print(f"Model path: {self.model_path}")
+        print(f"Label encoder path: {self.label_encoder_path}")
+        print(f"Current working directory: {base_dir}")
+        print(f"Model file exists: {os.path.exists(self.model_path)}")
+        print(f"Label encoder file exists: {os.path.exists(self.label_encoder_path)}")
+        
+    @staticmethod
+    def resolve_paths(model_path=None, label_encoder_path=None):
+        """Fill in default model/label encoder paths, relative to the current working directory"""
+        base_dir = os.getcwd()
+        if model_path is None:
+            model_path = os.path.join(base_dir, 'models', 'best_furniture_model.h5')
+        if label_encoder_path is None:
+            label_encoder_path = os.path.join(base_dir, 'models', 'label_encoder.pkl')
+        return model_path, label_encoder_path
+    
+    def _keras_engine(self):
+        return KerasEngine(self.model, call_strategy='predict' if self.call_strategy == 'predict' else 'function')
+    
+    def _load_from_manifest(self):
+        """Load exactly the artifact the model manifest names; False means fall back to probing"""
+        manifest = read_manifest(self.model_path)
+        if manifest is None:
+            return False
+        ok, message = verify_manifest(self.model_path, manifest)
+        if not ok:
+            print(f"Warning: Ignoring model manifest: {message}")
+            return False
+        if manifest['input_shape'] != [self.img_size, self.img_size, 3]:
+            print(f"Warning: Ignoring model manifest: input shape {manifest['input_shape']} "
+                  f"is not {[self.img_size, self.img_size, 3]}")
+            return False
+        
+        import tensorflow as tf
+        try:
+            self.model = tf.keras.models.load_model(manifest['artifact_path'], compile=False)
+        except Exception as e:
+            print(f"Warning: Loading {manifest['artifact_path']} from the manifest failed: {str(e)}")
+            return False
+        
+        if manifest['label_encoder_path']:
+            self.label_encoder_path = manifest['label_encoder_path']
+        self.manifest = manifest
+        self.engine = self._keras_engine()
+        print(f"Successfully {manifest['format']} model loaded from manifest: {manifest['artifact_path']}")
+        return True
+    
+    def _load_keras(self):
+        """Load the Keras model, straight from its manifest when there is a valid one"""
+        self.manifest = None
+        self._probed_artifact = None
+        return self._load_from_manifest() or self._load_keras_model()
+    
+    def _write_probed_manifest(self):
+        """Write a manifest for the artifact probing found, so the next load goes straight to it"""
+        artifact_path, artifact_format = self._probed_artifact
+        self._probed_artifact = None
+        try:
+            input_shape = (self.img_size, self.img_size, 3)
+            if getattr(self.model, 'inputs', None):
+                input_shape = tuple(self.model.inputs[0].shape[1:])
+            write_manifest(
+                self.model_path, artifact_path, self._class_labels(),
+                input_shape=input_shape,
+                label_encoder_path=self.label_encoder_path if os.path.exists(self.label_encoder_path) else None,
+                artifact_format=artifact_format
+            )
+            self.manifest = read_manifest(self.model_path)
+            print(f"Successfully wrote model manifest for {artifact_path}")
+        except Exception as e:
+            print(f"Warning: Could not write model manifest: {str(e)}")
+    
+    def _load_keras_model(self):
+        """Load the Keras model, trying several formats for compatibility"""
+        import tensorflow as tf
+        
+        # Debug: List all files in models directory
+        models_dir = os.path.dirname(self.model_path)
+        if os.path.exists(models_dir):
+            print(f"Files in {models_dir}:")
+            for file in os.listdir(models_dir):
+                full_path = os.path.join(models_dir, file)
+                if os.path.isfile(full_path):
+                    size = os.path.getsize(full_path)
+                    print(f"  {file} ({size:,} bytes)")
+                else:
+                    print(f"  {file}/")
+        else:
+            print(f"Models directory does not exist: {models_dir}")
+        
+        # Try multiple loading strategies for compatibility
+        model_loaded = False
+        
+        # Strategy 1: Try SavedModel format first (most compatible)
+        savedmodel_path = os.path.join(os.path.dirname(self.model_path), 'furniture_model_savedmodel')
+        if os.path.exists(savedmodel_path):
+            try:
+                print(f"� Trying SavedModel format: {savedmodel_path}")
+                
+                # For TensorFlow 2.15.0 compatibility, use tf.saved_model.load first
+                try:
+                    # Try standard loading
+                    self.model = tf.keras.models.load_model(savedmodel_path)
+                    model_loaded = True
+                    self._probed_artifact = (savedmodel_path, 'savedmodel')
+                    print(f"Successfully SavedModel loaded successfully with standard method")
+                except:
+                    # Try with tf.saved_model.load for older TF versions
+                    try:
+                        loaded = tf.saved_model.load(savedmodel_path)
+                        
+                        # Create a wrapper function for inference
+                        def predict_function(x):
+                            return loaded.signatures['serving_default'](tf.convert_to_tensor(x))['output_0']
+                        
+                        # Create a minimal wrapper class
+                        class SavedModelWrapper:
+                            def __init__(self, predict_fn):
+                                self._predict_fn = predict_fn
+                            
+                            def predict(self, x, verbose=0):
+                                if len(x.shape) == 3:
+                                    x = np.expand_dims(x, axis=0)
+                                return self._predict_fn(x.astype(np.float32)).numpy()
+                        
+                        self.model = SavedModelWrapper(predict_function)
+                        model_loaded = True
+                        print(f"Successfully SavedModel loaded with tf.saved_model.load wrapper")
+                    except Exception as e3:
+                        print(f"Warning: SavedModel tf.saved_model.load failed: {str(e3)}")
+                        
+            except Exception as e1:
+                print(f"Warning: SavedModel loading failed: {str(e1)}")
+        
+        # Strategy 2: Standard H5 loading
+        if not model_loaded and os.path.exists(self.model_path):
+            try:
+                self.model = tf.keras.models.load_model(self.model_path)
+                model_loaded = True
+                self._probed_artifact = (self.model_path, 'h5')
+                print(f"Successfully H5 model loaded successfully with standard method")
+            except Exception as e2:
+                print(f"Warning: Standard H5 loading failed: {str(e2)}")
+                
+                # Strategy 3: H5 with compile=False
+                try:
+                    self.model = tf.keras.models.load_model(self.model_path, compile=False)
+                    model_loaded = True
+                    self._probed_artifact = (self.model_path, 'h5')
+                    print(f"Successfully H5 model loaded successfully with compile=False")
+                except Exception as e3:
+                    print(f"Warning: H5 loading with compile=False failed: {str(e3)}")
+        
+        # Strategy 4: Try alternative H5 model
+        if not model_loaded:
+            alt_model_path = os.path.join(os.path.dirname(self.model_path), 'Training_0802_pax.h5')
+            if os.path.exists(alt_model_path):
+                try:
+                    print(f"Trying Trying alternative H5 model: {alt_model_path}")
+                    self.model = tf.keras.models.load_model(alt_model_path)
+                    model_loaded = True
+                    self._probed_artifact = (alt_model_path, 'h5')
+                    print(f"Successfully Alternative H5 model loaded successfully")
+                    # Update label encoder path to match
+                    alt_le_path = os.path.join(os.path.dirname(self.label_encoder_path), 'Training_0802_pax_label_encoder.pkl')
+                    if os.path.exists(alt_le_path):
+                        self.label_encoder_path = alt_le_path
+                        print(f"Successfully Updated label encoder path to: {alt_le_path}")
+                except Exception as e4:
+                    print(f"Warning: Alternative H5 model loading failed: {str(e4)}")
+        
+        if model_loaded:
+            self.engine = self._keras_engine()
+        return model_loaded
+    
+    @staticmethod
+    def serving_savedmodel_path(model_path):
+        """SavedModel whose serving signature is called, e.g. models/my_session_serving/
+        
+        The default model uses the furniture_model_savedmodel export next to it.
+        """
+        source_path = default_source_path(model_path)
+        if os.path.isdir(source_path):
+            return source_path
+        return os.path.splitext(source_path)[0] + '_serving'
+    
+    def _load_serving_signature_engine(self):
+        """Call the SavedModel serving signature, (re-)exporting it from the Keras model when
+        missing or made from an older model"""
+        savedmodel_path = self.serving_savedmodel_path(self.model_path)
+        try:
+            source_path = self.export_source_path(self.model_path)
+            exported = os.path.abspath(savedmodel_path) != os.path.abspath(source_path)
+            if exported and not self.export_is_current(savedmodel_path, source_path):
+                if not self._load_keras():
+                    return False
+                import tensorflow as tf
+                reason = "is stale" if os.path.exists(savedmodel_path) else "not found"
+                print(f"SavedModel {reason}, exporting {savedmodel_path} from {source_path}")
+                tmp_path = f"{savedmodel_path}.{os.getpid()}.tmp"
+                old_path = f"{savedmodel_path}.{os.getpid()}.old"
+                tf.saved_model.save(self.model, tmp_path)
+                try:
+                    # Move the stale export aside; os.replace cannot overwrite a directory
+                    os.replace(savedmodel_path, old_path)
+                except FileNotFoundError:
+                    pass
+                try:
+                    os.replace(tmp_path, savedmodel_path)
+                except OSError:
+                    # Another process exported it first
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                shutil.rmtree(old_path, ignore_errors=True)
+                write_export_stamp(savedmodel_path, source_path, self.source_stamp(source_path))
+            self.engine = SavedModelSignatureEngine(savedmodel_path)
+            self.model = None
+            print(f"Successfully serving signature loaded from {savedmodel_path}")
+            return True
+        except Exception as e:
+            print(f"Warning: SavedModel serving signature unavailable ({str(e)}), using the compiled Keras call")
+            return self.engine is not None or self._load_keras()
+    
+    def _load_cascade(self):
+        """Put the fast first-stage model in front of the already loaded full model"""
+        try:
+            import tensorflow as tf
+            if self.backend == 'tflite':
+                fast_path = tflite_model_path(self.cascade_model_path, self.quantization)
+                self._export_tflite(self.cascade_model_path, fast_path)
+                fast_engine = TFLiteEngine(fast_path, num_threads=self.num_threads)
+            else:
+                fast_engine = KerasEngine(tf.keras.models.load_model(self.cascade_model_path, compile=False))
+            self.engine = CascadeEngine(fast_engine, self.engine, threshold=self.cascade_threshold)
+            print(f"Successfully cascade enabled: {self.cascade_model_path} (threshold {self.cascade_threshold})")
+            return True
+        except Exception as e:
+            print(f"Warning: Cascade model loading failed: {str(e)}")
+            return False
+    
+    def _compute_model_version(self):
+        """Identify the loaded model by its artifacts and backend, for cache keys"""
+        if isinstance(self.engine, RemoteEngine):
+            return self.engine.model_version
+        artifacts = predictor_artifacts(self.model_path, self.label_encoder_path)
+        if isinstance(self.engine, CascadeEngine):
+            artifacts.append(self.cascade_model_path)
+        fingerprint = model_fingerprint(*artifacts)
+        version = f"{fingerprint}-{self.backend}"
+        if self.backend == 'tflite':
+            version += f"-{self.quantization}"
+        if isinstance(self.engine, CascadeEngine):
+            version += f"-cascade{self.cascade_threshold}"
+        return version
+    
+    def cascade_stats(self):
+        """Per-stage counters of the cascade, or None when it is not active"""
+        if isinstance(self.engine, (CascadeEngine, RemoteEngine)):
+            return self.engine.stats()
+        return None
+    
+    @staticmethod
+    def export_source_path(model_path):
+        """Model file the .tflite and serving exports of ``model_path`` are made from"""
+        manifest = read_manifest(model_path)
+        if manifest and verify_manifest(model_path, manifest)[0]:
+            return manifest['artifact_path']
+        return default_source_path(model_path)
+    
+    @staticmethod
+    def source_stamp(source_path):
+        """Identify the exact source model an export is made from (see tflite_export.source_stamp)"""
+        return source_stamp(source_path)
+    
+    @staticmethod
+    def export_is_current(export_path, source_path):
+        """True if export_path exists and was made from the source model as it is now"""
+        return (os.path.exists(export_path)
+                and read_export_stamp(export_path) == FurniturePredictor.source_stamp(source_path))
+    
+    def _export_tflite(self, source_path, tflite_path):
+        """(Re-)export tflite_path unless it was made from the current source_path"""
+        if self.export_is_current(tflite_path, source_path):
+            return
+        reason = "is stale" if os.path.exists(tflite_path) else "not found"
+        print(f"TFLite model {reason}, exporting from {source_path}")
+        export_tflite(source_path, output_path=tflite_path, quantization=self.quantization)
+    
+    def _load_tflite_engine(self):
+        """Load the quantized TFLite model, (re-)exporting it when missing or made from an older model"""
+        tflite_path = tflite_model_path(self.model_path, self.quantization)
+        try:
+            self._export_tflite(self.export_source_path(self.model_path), tflite_path)
+            self.engine = TFLiteEngine(tflite_path, num_threads=self.num_threads)
+            print(f"Successfully TFLite model loaded from {tflite_path}")
+            return True
+        except Exception as e:
+            print(f"Warning: TFLite model loading failed: {str(e)}")
+            return False
+    
+    def _load_remote_engine(self):
+        """Connect to the inference server, waiting until it has loaded its model"""
+        if not self.server_address or not self.server_authkey:
+            print("Error: The remote backend needs the inference server address and key")
+            return False
+        try:
+            self.engine = RemoteEngine(self.server_address, self.server_authkey)
+            print(f"Successfully connected to inference server at {self.server_address}")
+            return True
+        except Exception as e:
+            print(f"Warning: Inference server unavailable: {str(e)}")
+            return False
+    
+    def load_model(self):
+        """Load the trained model and label encoder, then warm it up"""
+        self._ready.clear()
+        try:
+            print(f"Loading model from: {self.model_path}")
+            
+            if self.backend == 'remote':
+                model_loaded = self._load_remote_engine()
+            elif self.backend == 'tflite':
+                model_loaded = self._load_tflite_engine()
+            elif self.call_strategy == 'serving_signature':
+                model_loaded = self._load_serving_signature_engine()
+            else:
+                model_loaded = self._load_keras()
+            
+            if not model_loaded:
+                print(f"Error: All model loading strategies failed")
+                return False
+            
+            # A remote model is cascaded (or not) by the server
+            if self.cascade_model_path and self.backend != 'remote' and not self._load_cascade():
+                print("Warning: Cascade disabled, using the full model for every image")
+            
+            self.model_version = self._compute_model_version()
+            set_model_info(self.model_version, self.backend)
+            
+            if self.backend == 'remote':
+                # Labels come from the server so they always match the model answering
+                self.label_encoder = None
+                self.labels = self.engine.class_labels
+            else:
+                self._load_label_encoder()
+            
+            if self._probed_artifact is not None:
+                self._write_probed_manifest()
+            
+            # The inference server warmed its model up before it started listening
+            if self.backend != 'remote':
+                self.warm_up()
+                
+        except Exception as e:
+            print(f"Error loading model: {str(e)}")
+            return False
+        self._ready.set()
+        return True
+    
+    def _load_label_encoder(self):
+        """Load the label encoder, falling back to the default class order"""
+        self.label_encoder = None
+        if os.path.exists(self.label_encoder_path):
+            try:
+                with open(self.label_encoder_path, 'rb') as f:
+                    self.label_encoder = pickle.load(f)
+                print(f"Successfully Label encoder loaded from {self.label_encoder_path}")
+                print(f"Label encoder classes: {list(self.label_encoder.classes_)}")
+                
+                # Verify the label encoder has the expected classes
+                expected_classes = set(self.class_names)
+                actual_classes = set(str(cls) for cls in self.label_encoder.classes_)
+                
+                if expected_classes != actual_classes:
+                    print(f"Warning: Label encoder class mismatch!")
+                    print(f"Expected: {self.class_names}")
+                    print(f"Actual: {list(self.label_encoder.classes_)}")
+                    print("Creating fallback encoder...")
+                    self.label_encoder = self._create_fallback_encoder()
+                    
+            except Exception as le_error:
+                print(f"Warning: Error loading label encoder: {str(le_error)}")
+                print("Creating fallback encoder...")
+                self.label_encoder = self._create_fallback_encoder()
+        else:
+            print(f"Label encoder not found at {self.label_encoder_path}")
+            print("Creating fallback encoder...")
+            self.label_encoder = self._create_fallback_encoder()
+        
+    @property
+    def ready(self):
+        """True once the model is loaded and warmed up"""
+        return self._ready.is_set()
+    
+    def wait_until_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+    
+    def warm_up(self, batch_sizes=None):
+        """Run a representative batch at each configured size through the engine
+        
+        Bypasses _run_model so warm-up batches do not show up in the metrics.
+        """
+        batch_sizes = self.warmup_batch_sizes if batch_sizes is None else batch_sizes
+        rng = np.random.default_rng(0)
+        for batch_size in batch_sizes:
+            batch = rng.random((batch_size, self.img_size, self.img_size, 3), dtype=np.float32)
+            start = time.perf_counter()
+            self.engine.warm_up(batch)
+            print(f"Warm-up: batch of {batch_size} in {time.perf_counter() - start:.2f}s")
+    
+    def _create_fallback_encoder(self):
+        """Create a fallback label encoder with correct class order"""
+        from sklearn.preprocessing import LabelEncoder
+        import numpy as np
+        
+        fallback_encoder = LabelEncoder()
+        # Manually set the classes in the correct order
+        fallback_encoder.classes_ = np.array(self.class_names, dtype=object)
+        print(f"Successfully Fallback encoder created with classes: {self.class_names}")
+        return fallback_encoder
+    
+    def _run_model(self, batch):
+        """Run one forward pass over a preprocessed batch of shape (N, H, W, 3)"""
+        BATCH_SIZE.observe(len(batch))
+        PREDICTIONS.inc(len(batch))
+        with stage_timer('forward'):
+            return self.engine.predict(batch)
+    
+    def _class_name_for(self, predicted_class_idx):
+        """Map a class index to its name, preferring the label encoder"""
+        if self.labels is not None:
+            return self.labels[predicted_class_idx] if predicted_class_idx < len(self.labels) else "Unknown"
+        try:
+            if self.label_encoder is not None:
+                if hasattr(self.label_encoder, 'classes_') and len(self.label_encoder.classes_) > predicted_class_idx:
+                    return str(self.label_encoder.classes_[predicted_class_idx])
+                print("Warning: Label encoder classes_ issue, using default")
+            else:
+                print("Warning: No label encoder, using default class names")
+        except Exception as class_error:
+            print(f"Error: Error getting class name: {str(class_error)}")
+        return self.class_names[predicted_class_idx] if predicted_class_idx < len(self.class_names) else "Unknown"
+    
+    def _build_result(self, prediction_row):
+        """Turn one row of model output into the prediction result dict"""
+        with stage_timer('label_mapping'):
+            confidence = np.max(prediction_row)
+            predicted_class_idx = int(np.argmax(prediction_row))
+            return {
+                'predicted_class': self._class_name_for(predicted_class_idx),
+                'confidence': float(confidence),
+                'all_predictions': prediction_row.tolist(),
+                'class_names': self.class_names
+            }
+    
+    def _infer_single(self, img_array):
+        """Predict one preprocessed image, going through the micro-batcher when enabled"""
+        if self.batcher is not None:
+            return self.batcher.predict(img_array)
+        return self._run_model(np.expand_dims(img_array, axis=0))[0]
+    
+    def _preprocess_pil(self, image):
+        """Convert a decoded PIL image into a normalized (H, W, 3) float32 array"""
+        with stage_timer('preprocess'):
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            if image.size != (self.img_size, self.img_size):
+                # Nearest-neighbour matches load_img's default used during training
+                image = image.resize((self.img_size, self.img_size), Image.NEAREST)
+            return np.asarray(image, dtype=np.float32) / 255.0
+    
+    def _preprocess_array(self, image_array):
+        """Normalize a raw RGB pixel array (values 0-255, any size) for the model"""
+        image_array = np.asarray(image_array)
+        if image_array.ndim != 3 or image_array.shape[-1] not in (1, 3, 4):
+            raise ValueError(f"Expected an (H, W, C) image array, got shape {image_array.shape}")
+        if image_array.shape[:2] != (self.img_size, self.img_size) or image_array.shape[-1] != 3:
+            return self._preprocess_pil(Image.fromarray(np.clip(image_array, 0, 255).astype(np.uint8).squeeze()))
+        with stage_timer('preprocess'):
+            return image_array.astype(np.float32) / 255.0
+    
+    def _predict_preprocessed(self, img_array):
+        """Shared tail of the predict_* entry points"""
+        if self.engine is None:
+            if not self.load_model():
+                print("Error: Failed to load model")
+                return None
+        
+        try:
+            prediction_row = self._infer_single(img_array)
+            result = self._build_result(prediction_row)
+            
+            print(f"✅ Prediction successful: {result['predicted_class']} ({result['confidence']:.3f})")
+            return result
+            
+        except Exception as e:
+            print(f"Error: Error making prediction: {str(e)}")
+            import traceback
+            print("Full traceback:")
+            traceback.print_exc()
+            return None
+    
+    def predict_pil(self, image):
+        """Make prediction on an already decoded PIL image, entirely in memory"""
+        try:
+            img_array = self._preprocess_pil(image)
+        except Exception as e:
+            print(f"Error: Error preprocessing image: {str(e)}")
+            return None
+        return self._predict_preprocessed(img_array)
+    
+    def predict_array(self, image_array):
+        """Make prediction on a raw RGB pixel array (0-255), resizing in memory if needed"""
+        try:
+            img_array = self._preprocess_array(image_array)
+        except Exception as e:
+            print(f"Error: Error preprocessing image: {str(e)}")
+            return None
+        return self._predict_preprocessed(img_array)
+    
+    def predict_bytes(self, image_bytes, image=None):
+        """Make prediction on raw upload bytes, consulting the prediction cache first
+        
+        ``image`` may pass the already decoded PIL image to avoid decoding twice on a miss.
+        """
+        if self.engine is None:
+            if not self.load_model():
+                print("Error: Failed to load model")
+                return None
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(image_bytes, self.model_version)
+            result = self.cache.get(cache_key)
+            if result is not None:
+                return result
+        
+        try:
+            if image is None:
+                image = Image.open(io.BytesIO(image_bytes))
+                # PIL decodes lazily; force it so decode and preprocess are timed apart
+                with stage_timer('decode'):
+                    image.load()
+            result = self.predict_pil(image)
+        except Exception as e:
+            print(f"Error: Error decoding image: {str(e)}")
+            return None
+        
+        if result is not None and cache_key is not None:
+            self.cache.put(cache_key, result)
+        return result
+    
+    def predict_image(self, image_path):
+        """Make prediction on a single image"""
+        try:
+            from tensorflow.keras.preprocessing.image import load_img, img_to_array
+            
+            # Load and preprocess image
+            with stage_timer('decode'):
+                img = load_img(image_path, target_size=(self.img_size, self.img_size))
+            with stage_timer('preprocess'):
+                img_array = img_to_array(img) / 255.0
+        except Exception as e:
+            print(f"Error: Error loading image {image_path}: {str(e)}")
+            return None
+        return self._predict_preprocessed(img_array)
+    
+    def batching_stats(self):
+        """Return micro-batching counters, or None when batching is disabled"""
+        return self.batcher.stats() if self.batcher is not None else None
+    
+    def close(self):
+        """Stop background workers owned by this predictor"""
+        if self.batcher is not None:
+            QUEUE_DEPTH.labels(queue='micro_batcher').clear_function(self.batcher.queue_depth)
+            self.batcher.stop()
+        if self.engine is not None:
+            self.engine.close()
+    
+    def _class_labels(self):
+        """Class names indexed by model output column, resolved once per batch"""
+        if self.labels is not None:
+            return list(self.labels)
+        if self.label_encoder is not None and hasattr(self.label_encoder, 'classes_'):
+            labels = [str(cls) for cls in self.label_encoder.classes_]
+        else:
+            labels = list(self.class_names)
+        return labels
+    
+    def _build_results(self, predictions):
+        """Vectorized version of _build_result over an (N, num_classes) output matrix"""
+        with stage_timer('label_mapping'):
+            predicted_idx = np.argmax(predictions, axis=1)
+            confidences = predictions[np.arange(len(predictions)), predicted_idx]
+            labels = self._class_labels()
+            return [
+                {
+                    'predicted_class': labels[idx] if idx < len(labels) else "Unknown",
+                    'confidence': float(confidence),
+                    'all_predictions': row.tolist(),
+                    'class_names': self.class_names
+                }
+                for idx, confidence, row in zip(predicted_idx, confidences, predictions)
+            ]
+    
+    def preprocess_image(self, source):
+        """Decode an image file path or binary file object into a model input array (raises on bad images)"""
+        with Image.open(source) as img:
+            with stage_timer('decode'):
+                img.load()
+            return self._preprocess_pil(img)
+    
+    def predict_preprocessed_batch(self, batch, batch_size=64):
+        """Predict an already preprocessed (N, H, W, 3) batch; returns one result dict per row"""
+        if len(batch) == 0:
+            return []
+        if self.engine is None:
+            if not self.load_model():
+                raise RuntimeError("Failed to load model")
+        predictions = np.concatenate([
+            np.asarray(self._run_model(batch[i:i + batch_size]))
+            for i in range(0, len(batch), batch_size)
+        ])
+        return self._build_results(predictions)
+    
+    def _decode_into(self, buffer, index, image_path):
+        """Decode one image file straight into a slot of a preallocated batch buffer"""
+        try:
+            with Image.open(image_path) as img:
+                with stage_timer('decode'):
+                    img.load()
+                buffer[index] = self._preprocess_pil(img)
+            return True
+        except Exception as e:
+            print(f"Error: Error loading image {image_path}: {str(e)}")
+            return False
+    
+    def predict_batch(self, image_paths, batch_size=64, memory_budget_mb=512, num_workers=None):
+        """Make predictions on multiple images
+        
+        Images are decoded in parallel into a reusable float32 buffer holding as many
+        images as fit in ``memory_budget_mb``; each buffer is run through the model in
+        forward passes of ``batch_size``. Unreadable images are skipped, as before.
+        """
+        if self.engine is None:
+            if not self.load_model():
+                print("Error: Failed to load model")
+                return []
+        
+        image_paths = list(image_paths)
+        if not image_paths:
+            return []
+        
+        bytes_per_image = self.img_size * self.img_size * 3 * np.dtype(np.float32).itemsize
+        chunk_size = max(batch_size, (memory_budget_mb * 1024 * 1024) // bytes_per_image)
+        chunk_size = min(chunk_size, len(image_paths))
+        buffer = np.empty((chunk_size, self.img_size, self.img_size, 3), dtype=np.float32)
+        num_workers = num_workers or min(8, os.cpu_count() or 1)
+        
+        results = []
+        start_time = datetime.now()
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for chunk_start in range(0, len(image_paths), chunk_size):
+                chunk_paths = image_paths[chunk_start:chunk_start + chunk_size]
+                decoded = list(executor.map(
+                    self._decode_into,
+                    [buffer] * len(chunk_paths),
+                    range(len(chunk_paths)),
+                    chunk_paths
+                ))
+                
+                valid = np.flatnonzero(decoded)
+                if len(valid) == 0:
+                    continue
+                # Compact the successfully decoded images to the front of the buffer
+                if len(valid) < len(chunk_paths):
+                    buffer[:len(valid)] = buffer[valid]
+                
+                try:
+                    predictions = np.concatenate([
+                        np.asarray(self._run_model(buffer[i:min(i + batch_size, len(valid))]))
+                        for i in range(0, len(valid), batch_size)
+                    ])
+                except Exception as e:
+                    print(f"Error: Error making batch prediction: {str(e)}")
+                    continue
+                
+                for position, result in zip(valid, self._build_results(predictions)):
+                    result['image_path'] = chunk_paths[position]
+                    results.append(result)
+        
+        elapsed = (datetime.now() - start_time).total_seconds()
+        print(f"✅ Batch prediction: {len(results)}/{len(image_paths)} images in {elapsed:.2f}s")
+        return results
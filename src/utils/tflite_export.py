@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Export the furniture model to TensorFlow Lite
+
+Converts the SavedModel in models/furniture_model_savedmodel (or a retrained
+.h5 file) into a .tflite file quantized to float16 or int8. Int8 export is
+calibrated on a sample of the training images listed in
+processed_data/paths_train.npy.
+
+Usage:
+    python src/utils/tflite_export.py --quantization float16
+    python src/utils/tflite_export.py --source models/my_session.h5 --quantization int8
+    python src/utils/tflite_export.py --quantization int8 --evaluate
+
+Author: Furniture Classification Project
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+QUANTIZATION_MODES = ('float32', 'float16', 'int8')
+IMG_SIZE = 224
+DEFAULT_MODEL_STEMS = ('best_furniture_model', 'furniture_model_savedmodel')
+
+
+def _split_model_path(model_path):
+    model_path = os.path.abspath(model_path.rstrip(os.sep))
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.dirname(model_path), stem
+
+
+def tflite_model_path(model_path, quantization):
+    """Where the .tflite export of a model lives, e.g. models/my_session_int8.tflite
+
+    The default model (best_furniture_model.h5 / furniture_model_savedmodel)
+    maps to models/furniture_model_<quantization>.tflite.
+    """
+    models_dir, stem = _split_model_path(model_path)
+    if stem in DEFAULT_MODEL_STEMS:
+        stem = 'furniture_model'
+    return os.path.join(models_dir, f'{stem}_{quantization}.tflite')
+
+
+def default_source_path(model_path):
+    """Model to convert for a predictor model path
+
+    For the default model, prefer the SavedModel export next to it, as
+    FurniturePredictor.load_model does; retrained .h5 files convert directly.
+    """
+    models_dir, stem = _split_model_path(model_path)
+    savedmodel_path = os.path.join(models_dir, 'furniture_model_savedmodel')
+    if stem in DEFAULT_MODEL_STEMS and os.path.exists(savedmodel_path):
+        return savedmodel_path
+    return model_path
+
+
+def export_stamp_path(export_path):
+    """Sidecar recording which source model an export was made from"""
+    return export_path.rstrip(os.sep) + '.source.json'
+
+
+def source_stamp(source_path):
+    """Identify the exact source model by path, size and mtime
+
+    Not the manifest checksum: a manifest written after the export would make
+    an up-to-date export look stale.
+    """
+    from src.utils.model_registry import model_fingerprint
+    return model_fingerprint(source_path)
+
+
+def read_export_stamp(export_path):
+    try:
+        with open(export_stamp_path(export_path)) as f:
+            return json.load(f).get('stamp')
+    except (OSError, ValueError):
+        return None
+
+
+def write_export_stamp(export_path, source_path, stamp):
+    stamp_path = export_stamp_path(export_path)
+    tmp_path = f"{stamp_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'source': os.path.abspath(source_path), 'stamp': stamp}, f, indent=2)
+    os.replace(tmp_path, stamp_path)
+
+
+def export_paths(model_path):
+    """Every export derived from a model: its .tflite files and <stem>_serving/ SavedModel"""
+    models_dir, stem = _split_model_path(model_path)
+    paths = [tflite_model_path(model_path, quantization) for quantization in QUANTIZATION_MODES]
+    paths.append(os.path.join(models_dir, f'{stem}_serving'))
+    return paths
+
+
+def remove_exports(model_path):
+    """Delete the exports of a model that was just replaced, so none of them is served stale"""
+    import shutil
+
+    removed = 0
+    for path in export_paths(model_path):
+        for candidate in (path, export_stamp_path(path)):
+            if os.path.isdir(candidate):
+                shutil.rmtree(candidate, ignore_errors=True)
+                removed += 1
+            elif os.path.exists(candidate):
+                os.remove(candidate)
+                removed += 1
+    return removed
+
+
+def resolve_dataset_paths(paths, processed_dir):
+    """Paths in processed_data/*.npy are relative to the notebooks directory"""
+    return [
+        path if os.path.isabs(path) else os.path.normpath(os.path.join(processed_dir, str(path)))
+        for path in paths
+    ]
+
+
+def load_calibration_images(processed_dir='processed_data', num_samples=200, seed=42):
+    """Sample and preprocess training images for int8 calibration"""
+    paths = np.load(os.path.join(processed_dir, 'paths_train.npy'), mmap_mode='r')
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(paths), size=min(num_samples, len(paths)), replace=False)
+    sample_paths = resolve_dataset_paths([str(paths[i]) for i in sample], processed_dir)
+
+    images = []
+    for path in sample_paths:
+        try:
+            with Image.open(path) as img:
+                img = img.convert('RGB').resize((IMG_SIZE, IMG_SIZE), Image.NEAREST)
+                images.append(np.asarray(img, dtype=np.float32) / 255.0)
+        except Exception as e:
+            print(f"Warning: Skipping calibration image {path}: {str(e)}")
+
+    if not images:
+        raise ValueError(f"No calibration images could be read from {processed_dir}/paths_train.npy")
+    print(f"Loaded {len(images)} calibration images")
+    return np.stack(images)
+
+
+def _create_converter(source_path):
+    import tensorflow as tf
+
+    if os.path.isdir(source_path):
+        return tf.lite.TFLiteConverter.from_saved_model(source_path)
+    model = tf.keras.models.load_model(source_path, compile=False)
+    return tf.lite.TFLiteConverter.from_keras_model(model)
+
+
+def export_tflite(source_path, output_path=None, quantization='float16',
+                  calibration_images=None, processed_dir='processed_data', num_calibration_samples=200):
+    """Convert a SavedModel directory or .h5 file to .tflite and return the output path"""
+    import tensorflow as tf
+
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Model not found: {source_path}")
+
+    if output_path is None:
+        output_path = tflite_model_path(source_path, quantization)
+
+    print(f"Exporting {source_path} to {output_path} ({quantization})")
+    converter = _create_converter(source_path)
+
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration_images is None:
+            calibration_images = load_calibration_images(processed_dir, num_calibration_samples)
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [np.expand_dims(image, axis=0).astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+
+    tflite_model = converter.convert()
+
+    # Write to a temporary file first so a half-written model is never picked up
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(tflite_model)
+    os.replace(tmp_path, output_path)
+    # Lets FurniturePredictor tell this export is current, whoever made it
+    write_export_stamp(output_path, source_path, source_stamp(source_path))
+
+    print(f"Successfully exported TFLite model ({len(tflite_model):,} bytes)")
+    return output_path
+
+
+def evaluate_backends(models_dir='models', processed_dir='processed_data', quantization='float16',
+                      max_images=None, results_path='notebooks/model_results.json'):
+    """Compare test accuracy of the Keras and TFLite backends with the notebook results"""
+    from src.utils.predictor import FurniturePredictor
+
+    paths = np.load(os.path.join(processed_dir, 'paths_test.npy'), mmap_mode='r')
+    labels = np.argmax(np.load(os.path.join(processed_dir, 'y_test.npy'), mmap_mode='r'), axis=1)
+    if max_images:
+        paths, labels = paths[:max_images], labels[:max_images]
+    paths = resolve_dataset_paths([str(p) for p in paths], processed_dir)
+    label_for_path = dict(zip(paths, labels))
+
+    report = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            report['notebook_test_accuracy'] = json.load(f).get('test_accuracy')
+
+    model_path = os.path.join(models_dir, 'best_furniture_model.h5')
+    for backend in ('keras', 'tflite'):
+        predictor = FurniturePredictor(model_path=model_path, backend=backend, quantization=quantization)
+        if not predictor.load_model():
+            report[backend] = None
+            continue
+        results = predictor.predict_batch(paths)
+        predicted = np.array([np.argmax(r['all_predictions']) for r in results])
+        expected = np.array([label_for_path[r['image_path']] for r in results])
+        report[backend] = float(np.mean(predicted == expected)) if len(results) else None
+        predictor.close()
+
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the furniture model to TensorFlow Lite")
+    parser.add_argument('--source', help="SavedModel directory or .h5 file (default: models/furniture_model_savedmodel)")
+    parser.add_argument('--output', help="Output .tflite path (default: next to the source, suffixed with the quantization)")
+    parser.add_argument('--quantization', choices=QUANTIZATION_MODES, default='float16')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--processed-dir', default='processed_data')
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--evaluate', action='store_true', help="Compare Keras and TFLite test accuracy after export")
+    parser.add_argument('--max-eval-images', type=int, default=None)
+    args = parser.parse_args()
+
+    source = args.source or default_source_path(os.path.join(args.models_dir, 'best_furniture_model.h5'))
+    export_tflite(
+        source,
+        output_path=args.output,
+        quantization=args.quantization,
+        processed_dir=args.processed_dir,
+        num_calibration_samples=args.calibration_samples
+    )
+    if args.evaluate:
+        evaluate_backends(args.models_dir, args.processed_dir, args.quantization, args.max_eval_images)
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    main()
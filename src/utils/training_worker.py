@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Background training worker
+
+Runs retraining jobs outside the Streamlit/API process so serving never
+blocks on model.fit. Jobs are queued in the training_jobs table of the
+SQLite database; the worker claims them one at a time, reports per-epoch
+progress back to the same row (which the UI polls), honours cancellation
+requests between epochs and publishes the finished model atomically.
+
+Usage:
+    python -m src.utils.training_worker
+    python -m src.utils.training_worker --once
+    python -m src.utils.training_worker --wait
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import traceback
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, fall back to the PID check alone
+    fcntl = None
+
+from src.utils.model_manifest import manifest_path, move_manifest, verified_cache_path
+from src.utils.tflite_export import remove_exports
+
+DEFAULT_DB_PATH = 'database/furniture_classification.db'
+
+
+def _pid_file(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'training_worker.pid')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_pid_file(db_path, wait=False):
+    """Open the PID file and take its exclusive lock; returns the open descriptor, or
+    None when another worker holds it and wait is False. The lock lives as long as the
+    descriptor, so a worker that dies releases it and the file itself is never deleted"""
+    fd = os.open(_pid_file(db_path), os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    return fd
+
+
+def worker_running(db_path=DEFAULT_DB_PATH):
+    """Check whether a worker holds the PID file lock"""
+    try:
+        fd = os.open(_pid_file(db_path), os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        if fcntl is None:
+            return _pid_alive(int(os.read(fd, 32).decode().strip()))
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        return False
+    except ValueError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def ensure_worker_process(db_path=DEFAULT_DB_PATH):
+    """Start a detached worker process unless one is already running; if two callers
+    race past the check, the second worker fails to take the PID file lock and exits"""
+    if worker_running(db_path):
+        return False
+    log_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'training_worker.log')
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with open(log_path, 'a') as log:
+        subprocess.Popen(
+            [sys.executable, '-m', 'src.utils.training_worker', '--db-path', db_path],
+            cwd=project_root,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+    print(f"Started training worker (log: {log_path})")
+    return True
+
+
+def _partial_path(model_path):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.partial{ext or '.h5'}"
+
+
+def _label_encoder_path(model_path):
+    return model_path.replace('.h5', '_label_encoder.pkl')
+
+
+class TrainingWorker:
+    def __init__(self, db_path=DEFAULT_DB_PATH, poll_interval=2.0):
+        from src.utils.database import FurnitureDB
+
+        self.db_path = db_path
+        self.db = FurnitureDB(db_path)
+        self.poll_interval = poll_interval
+        self._stopping = False
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run_forever(self, wait=False):
+        """Poll the job queue until stopped; returns False if another worker is running,
+        unless wait is set, in which case it takes over once that worker exits"""
+        if wait and worker_running(self.db_path):
+            print("Another training worker is running; waiting for it to exit")
+        lock_fd = _lock_pid_file(self.db_path, wait)
+        if lock_fd is None:
+            print("Training worker already running; exiting")
+            return False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # A job is only orphaned if its claiming process is gone; this process has
+        # claimed nothing yet, so a row carrying a reused copy of its PID is stale too
+        interrupted = self.db.fail_interrupted_training_jobs(
+            lambda pid: pid != os.getpid() and _pid_alive(pid)
+        )
+        if interrupted:
+            print(f"Marked {interrupted} interrupted training job(s) as failed")
+
+        print(f"Training worker {os.getpid()} waiting for jobs...")
+        try:
+            while not self._stopping:
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+        finally:
+            os.close(lock_fd)
+        return True
+
+    def run_once(self):
+        """Process one queued job; returns False when the queue was empty"""
+        job = self.db.claim_next_training_job()
+        if job is None:
+            return False
+        print(f"Claimed training job {job['id']} ({job['session_name']})")
+        self.process_job(job)
+        return True
+
+    def process_job(self, job):
+        from src.utils.trainer import FurnitureModelTrainer
+
+        job_id = job['id']
+        model_path = job['model_path']
+        partial_path = _partial_path(model_path)
+
+        try:
+            requirements_met, message = self.db.check_training_data_requirements()
+            if not requirements_met:
+                self.db.finish_training_job(job_id, 'failed', message)
+                return
+
+            combined_data = self.db.get_combined_training_data()
+            self.db.update_training_job(
+                job_id,
+                total_data_count=len(combined_data),
+                message=f"Training on {len(combined_data)} images"
+            )
+
+            os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+            progress = _progress_callback(self.db, job_id, job['epochs'])
+            trainer = FurnitureModelTrainer()
+            results = trainer.train_model(
+                combined_data,
+                epochs=job['epochs'],
+                model_save_path=partial_path,
+                use_embedding_cache=bool(job['use_embedding_cache']),
+                extra_callbacks=[progress]
+            )
+
+            if progress.cancelled:
+                self._discard(partial_path)
+                self.db.finish_training_job(job_id, 'cancelled', 'Training cancelled')
+                return
+
+            self._publish(partial_path, model_path)
+
+            session_id = self.db.log_retraining_session(
+                session_name=job['session_name'],
+                original_count=results['original_count'],
+                user_count=results['user_count'],
+                total_count=len(combined_data),
+                final_accuracy=results['final_accuracy'],
+                training_time=results['training_time'],
+                model_path=model_path
+            )
+            self.db.log_metrics(session_id, {
+                'final_accuracy': results['final_accuracy'],
+                'training_time_minutes': results['training_time']
+            })
+            self.db.finish_training_job(
+                job_id, 'completed', 'Training completed',
+                progress=1.0,
+                session_id=session_id,
+                final_accuracy=float(results['final_accuracy']),
+                training_time_minutes=float(results['training_time'])
+            )
+            print(f"Training job {job_id} completed: {model_path}")
+
+        except Exception as e:
+            traceback.print_exc()
+            self._discard(partial_path)
+            self.db.finish_training_job(job_id, 'failed', f"Training failed: {str(e)}")
+
+    @staticmethod
+    def _publish(partial_path, model_path):
+        """Move the finished model into place; the model file is renamed after its
+        label encoder so anyone who sees it also sees the encoder, and the manifest
+        follows the model (until then the old manifest fails its checksum and the
+        predictor falls back to probing); exports of the previous model are deleted"""
+        os.replace(_label_encoder_path(partial_path), _label_encoder_path(model_path))
+        os.replace(partial_path, model_path)
+        move_manifest(partial_path, model_path, _label_encoder_path(model_path))
+        remove_exports(model_path)
+
+    @staticmethod
+    def _discard(partial_path):
+        for path in (partial_path, _label_encoder_path(partial_path), manifest_path(partial_path),
+                     verified_cache_path(partial_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _progress_callback(db, job_id, total_epochs):
+    """Keras callback that writes epoch progress to the job row and honours cancellation"""
+    import tensorflow as tf
+
+    class TrainingProgressCallback(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.cancelled = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = {name: float(value) for name, value in (logs or {}).items()}
+            db.update_training_job(
+                job_id,
+                current_epoch=epoch + 1,
+                progress=(epoch + 1) / total_epochs,
+                last_metrics=json.dumps(logs),
+                message=f"Epoch {epoch + 1}/{total_epochs} finished"
+            )
+            if db.is_training_job_cancel_requested(job_id):
+                self.cancelled = True
+                self.model.stop_training = True
+
+    return TrainingProgressCallback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued retraining jobs")
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH)
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--once', action='store_true', help="Process at most one job and exit")
+    parser.add_argument('--wait', action='store_true',
+                        help="If another worker is running, wait and take over when it exits instead of exiting")
+    args = parser.parse_args()
+
+    worker = TrainingWorker(args.db_path, args.poll_interval)
+    if args.once:
+        worker.run_once()
+    elif not worker.run_forever(args.wait):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()